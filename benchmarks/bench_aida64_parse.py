@@ -0,0 +1,78 @@
+"""Benchmark: selective AIDA64 shared memory reads against a full parse
+
+Writes a fake AIDA64 shared memory block to a NUL padded file and compares
+a python_aida64 style full parse (ElementTree over the whole block) with
+AIDA64SharedMemorySource when the block is unchanged, when it changed and
+a few sensors are assigned, and when the full catalog is read.
+
+    python benchmarks/bench_aida64_parse.py
+"""
+import os
+import sys
+import tempfile
+import timeit
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_sensors import AIDA64SharedMemorySource
+
+CATEGORIES = ["sys", "temp", "fan", "duty", "volt", "curr", "pwr"]
+BLOCK_SIZE = 262144
+
+
+def make_block(sensor_count):
+    """Returns the XML fragments AIDA64 would export for sensor_count sensors"""
+    parts = []
+    for i in range(sensor_count):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        parts.append(f"<{category}><id>S{category.upper()}{i}</id><label>Sensor {i}</label>"
+                     f"<value>{i % 100}</value></{category}>")
+    return "".join(parts).encode()
+
+
+def full_parse(raw):
+    """What getData() does on every call: parse everything into dicts"""
+    root = ET.fromstring(b"<root>" + raw + b"</root>")
+    data = {}
+    for element in root:
+        data.setdefault(element.tag, []).append(
+            {child.tag: child.text for child in element})
+    return data
+
+
+def main():
+    print(f"{'sensors':>8} {'wanted':>7} {'full us':>8} {'same us':>8} "
+          f"{'changed us':>11} {'catalog us':>11}")
+    for sensor_count in (100, 300, 1000):
+        block = make_block(sensor_count)
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            file.write(block + b"\x00" * (BLOCK_SIZE - len(block)))
+            path = file.name
+        try:
+            for wanted_count in (1, 8, 16):
+                source = AIDA64SharedMemorySource(path)
+                wanted = [f"S{CATEGORIES[i % len(CATEGORIES)].upper()}{i}"
+                          for i in range(0, sensor_count, sensor_count // wanted_count)]
+                source.set_wanted_ids(wanted[:wanted_count])
+                runs = 200
+                full = min(timeit.repeat(lambda: full_parse(source._read_raw()),
+                                         number=runs, repeat=3)) / runs * 1e6
+                source.read()
+                same = min(timeit.repeat(source.read, number=runs, repeat=3)) / runs * 1e6
+
+                def changed_read():
+                    source._last_raw = None  # as if AIDA64 had written new values
+                    source.read()
+                changed = min(timeit.repeat(changed_read, number=runs, repeat=3)) / runs * 1e6
+                catalog = min(timeit.repeat(source.read_catalog, number=runs,
+                                            repeat=3)) / runs * 1e6
+                source.close()
+                print(f"{sensor_count:>8} {wanted_count:>7} {full:>8.1f} {same:>8.1f} "
+                      f"{changed:>11.1f} {catalog:>11.1f}")
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
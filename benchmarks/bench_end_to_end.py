@@ -0,0 +1,159 @@
+"""Benchmark: startup, update ticks and shutdown against a local mock VU1 server
+
+For 1, 8, 32 and 128 dials this starts benchmarks/mock_server.py and measures
+
+- startup: VU1GUI() until fetch_all_dial_details has loaded every dial
+  (cold image cache), run offscreen, skipped if PyQt6 is not installed,
+- ticks: DialUpdater.update_all_dials with values that change on every
+  tick, so every dial is written each time (the worst case),
+- shutdown: VU1GUI.shutdown_dials, which zeroes every dial.
+
+    python benchmarks/bench_end_to_end.py [--latency MS] [--ticks N]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockVU1Server
+from vu1_client import VU1Client
+from vu1_engine import ChangeFilter, DialUpdater
+from vu1_sensors import SensorSource
+
+DIAL_COUNTS = (1, 8, 32, 128)
+
+
+class ChangingSource(SensorSource):
+    """One sensor per dial whose value changes on every read"""
+    name = "benchmark"
+
+    def __init__(self, sensor_count):
+        self.sensor_count = sensor_count
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return {"sys": [{"id": f"S{i}", "label": f"Sensor {i}",
+                         "value": str((self.reads * 7 + i) % 100)}
+                        for i in range(self.sensor_count)]}
+
+
+def write_aida64_block(path, sensor_count):
+    """Writes a fake AIDA64 shared memory block, so the GUI runs without AIDA64"""
+    block = "".join(f"<sys><id>S{i}</id><label>Sensor {i}</label><value>{i % 100}</value></sys>"
+                    for i in range(sensor_count)).encode()
+    with open(path, "wb") as file:
+        file.write(block + b"\x00" * (max(len(block), 65536) - len(block) + 1024))
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[int(share * (len(values) - 1))]
+
+
+def load_gui_module():
+    """Imports vu1-dials-gui.py offscreen, or returns None without PyQt6"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+    except ImportError:
+        return None, None
+    spec = importlib.util.spec_from_file_location("vu1_dials_gui",
+                                                  os.path.join(ROOT, "vu1-dials-gui.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module, QApplication.instance() or QApplication([])
+
+
+def bench_gui(module, app, server, dial_ids):
+    """Returns (startup s, first dial s, shutdown s, startup requests)"""
+    with tempfile.TemporaryDirectory() as folder:
+        block_file = os.path.join(folder, "aida64.bin")
+        write_aida64_block(block_file, len(dial_ids))
+        with open(os.path.join(folder, "settings.json"), "w") as file:
+            json.dump({"server_address": server.url, "api_key": server.api_key,
+                       "sensor_source": "aida64", "aida64_file": block_file}, file)
+        with open(os.path.join(folder, "assignments.json"), "w") as file:
+            json.dump({"sensor_assignments": {dial_id: f"Sensor {i} (S{i})"
+                                              for i, dial_id in enumerate(dial_ids)}}, file)
+        server.reset_counts()
+        started = time.perf_counter()
+        window = module.VU1GUI(base_path=folder)
+        while window.pending_loads > 0:
+            app.processEvents()
+            time.sleep(0.001)
+        startup = time.perf_counter() - started
+        requests = sum(server.reset_counts().values())
+
+        app.aboutToQuit.disconnect(window.shutdown_dials)
+        started = time.perf_counter()
+        window.shutdown_dials()
+        shutdown = time.perf_counter() - started
+        window.tray_icon.hide()
+        window.hide()
+        window.deleteLater()
+        app.processEvents()
+    return startup, window.first_dial_time or 0.0, shutdown, requests
+
+
+def bench_ticks(server, dial_ids, ticks):
+    """Returns (writes per second, tick latencies in seconds)"""
+    client = VU1Client(server.url, server.api_key)
+    updater = DialUpdater(client, ChangingSource(len(dial_ids)), ChangeFilter(),
+                          tick_deadline=5.0)
+    updater.set_assignments({dial_id: f"S{i}" for i, dial_id in enumerate(dial_ids)}, {}, {})
+    updater.schedule_sensor_updates()  # warm up the connection pool
+    server.reset_counts()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(ticks):
+        tick_started = time.perf_counter()
+        updater.schedule_sensor_updates()
+        latencies.append(time.perf_counter() - tick_started)
+    elapsed = time.perf_counter() - started
+    writes = server.reset_counts()["set"]
+    updater.close()
+    client.close()
+    return writes / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=2.0,
+                        help="mock server delay per request in milliseconds")
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    module, app = load_gui_module()
+    if module is None:
+        print("startup and shutdown skipped, PyQt6 is not installed")
+    print(f"mock server latency {args.latency:.1f} ms, {args.ticks} ticks per run")
+    print(f"{'dials':>6} {'startup s':>10} {'first s':>8} {'requests':>9} {'writes/s':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} {'shutdown s':>11}")
+    for dial_count in DIAL_COUNTS:
+        server = MockVU1Server(dial_count, latency=args.latency / 1000).start()
+        dial_ids = list(server.dials)
+        try:
+            rate, latencies = bench_ticks(server, dial_ids, args.ticks)
+            if module is not None:
+                startup, first, shutdown, requests = bench_gui(module, app, server, dial_ids)
+                gui = (f"{startup:>10.3f} {first:>8.3f} {requests:>9}", f"{shutdown:>11.3f}")
+            else:
+                gui = (f"{'-':>10} {'-':>8} {'-':>9}", f"{'-':>11}")
+        finally:
+            server.stop()
+        print(f"{dial_count:>6} {gui[0]} {rate:>9.0f} "
+              f"{percentile(latencies, 0.5) * 1000:>7.1f} "
+              f"{percentile(latencies, 0.95) * 1000:>7.1f} "
+              f"{max(latencies) * 1000:>7.1f} {gui[1]}")
+
+
+if __name__ == "__main__":
+    main()
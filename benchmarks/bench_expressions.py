@@ -0,0 +1,52 @@
+"""Benchmark: evaluating dial expressions compiled into one function, compared with eval() per dial
+
+Every dial shows max() over four sensors plus an offset, as a dial for the
+hottest CPU core would. The compiled set is evaluated with one call per
+tick, the baseline evaluates the text of every dial with eval() each tick.
+
+    python benchmarks/bench_expressions.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_expressions import ExpressionSet
+
+TICKS = 2000
+
+
+def build(dial_count):
+    expressions = {f"D{d}": f"max(S{d}_0, S{d}_1, S{d}_2, S{d}_3) - 20" for d in range(dial_count)}
+    index = {f"S{d}_{s}": str(40 + s) for d in range(dial_count) for s in range(4)}
+    return expressions, index
+
+
+def naive(expressions, index):
+    values = {sensor_id: float(value) for sensor_id, value in index.items()}
+    return {dial_id: eval(text, {"max": max}, values) for dial_id, text in expressions.items()}
+
+
+def measure(function, *args):
+    started = time.perf_counter()
+    for _ in range(TICKS):
+        function(*args)
+    return (time.perf_counter() - started) / TICKS * 1e6
+
+
+def main():
+    print(f"{'dials':>6} {'compiled us':>12} {'eval() us':>10} {'compile ms':>11}")
+    for dial_count in (1, 8, 32, 128):
+        expressions, index = build(dial_count)
+        started = time.perf_counter()
+        expression_set = ExpressionSet(expressions)
+        compile_time = (time.perf_counter() - started) * 1000
+        assert expression_set.evaluate(index) == naive(expressions, index)
+        compiled = measure(expression_set.evaluate, index)
+        baseline = measure(naive, expressions, index)
+        print(f"{dial_count:>6} {compiled:>12.1f} {baseline:>10.1f} {compile_time:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
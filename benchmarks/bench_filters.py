@@ -0,0 +1,69 @@
+"""Benchmark: vectorized dial filters against a per-dial Python loop
+
+Filters 8 to 128 dials (a mix of EMA, median and peak hold over 10 samples)
+once per tick with DialFilters and with a plain loop over one deque per
+dial, and prints the cost per tick.
+
+    python benchmarks/bench_filters.py
+"""
+import os
+import statistics
+import sys
+import timeit
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_filters import DialFilters
+
+TYPES = ("ema", "median", "peak")
+WINDOW = 10
+
+
+class LoopFilters:
+    """One deque and one running average per dial"""
+
+    def __init__(self, sensor_ids, filters):
+        self.sensor_ids = sensor_ids
+        self.filters = filters
+        self.history = {dial_id: deque(maxlen=config["window"])
+                        for dial_id, config in filters.items()}
+        self.ema = {}
+
+    def update(self, sensor_index):
+        result = {}
+        for dial_id, config in self.filters.items():
+            value = float(sensor_index[self.sensor_ids[dial_id]])
+            samples = self.history[dial_id]
+            samples.append(value)
+            if config["type"] == "ema":
+                alpha = 2.0 / (config["window"] + 1)
+                last = self.ema.get(dial_id, value)
+                result[dial_id] = self.ema[dial_id] = last + alpha * (value - last)
+            elif config["type"] == "median":
+                result[dial_id] = statistics.median(samples)
+            else:
+                result[dial_id] = max(samples)
+        return result
+
+
+def main():
+    print(f"{'dials':>6} {'numpy us':>9} {'loop us':>8}")
+    for dial_count in (8, 32, 128):
+        sensor_ids = {f"D{i}": f"S{i}" for i in range(dial_count)}
+        filters = {f"D{i}": {"type": TYPES[i % len(TYPES)], "window": WINDOW}
+                   for i in range(dial_count)}
+        sensor_index = {f"S{i}": str(i % 100) for i in range(dial_count)}
+        vectorized = DialFilters()
+        vectorized.configure(sensor_ids, filters)
+        loop = LoopFilters(sensor_ids, filters)
+        runs = 2000
+        numpy_time = min(timeit.repeat(lambda: vectorized.update(sensor_index),
+                                       number=runs, repeat=3)) / runs * 1e6
+        loop_time = min(timeit.repeat(lambda: loop.update(sensor_index),
+                                      number=runs, repeat=3)) / runs * 1e6
+        print(f"{dial_count:>6} {numpy_time:>9.1f} {loop_time:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark: FlowLayout time for bulk dial creation and window resizes
+
+For 8, 32, 128 and 256 dial panels in a FlowLayout this measures, offscreen:
+
+- create: adding all DialWidgets hidden with the layout disabled, like
+  fetch_all_dial_details(), then showing them as their status arrives, 8
+  per event loop pass (the widgets themselves are built beforehand and not
+  counted),
+- resize: one window resize including the re-layout, averaged over a sweep
+  of 40 widths between 700 and 1900 pixels,
+- height: one heightForWidth() call at an unchanged width.
+
+Skipped if PyQt6 is not installed.
+
+    python benchmarks/bench_flow_layout.py
+"""
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DIAL_COUNTS = (8, 32, 128, 256)
+WIDTHS = [700 + 30 * step for step in range(40)]
+
+
+def load_gui_module():
+    """Imports vu1-dials-gui.py offscreen, or returns None without PyQt6"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+    except ImportError:
+        return None, None
+    spec = importlib.util.spec_from_file_location("vu1_dials_gui",
+                                                  os.path.join(ROOT, "vu1-dials-gui.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module, QApplication.instance() or QApplication([])
+
+
+def bench(module, app, dial_count):
+    from PyQt6.QtWidgets import QVBoxLayout, QWidget
+
+    window = QWidget()
+    window_layout = QVBoxLayout(window)
+    container = QWidget()
+    layout = module.FlowLayout(container)
+    container.setLayout(layout)
+    window_layout.addWidget(container)
+    window.resize(WIDTHS[0], 800)
+    window.show()
+    app.processEvents()
+    widgets = [module.DialWidget(dial_id=f"D{i}") for i in range(dial_count)]
+
+    started = time.perf_counter()
+    layout.setEnabled(False)
+    for widget in widgets:
+        widget.hide()
+        layout.addWidget(widget)
+    layout.setEnabled(True)
+    for index, widget in enumerate(widgets):
+        if index % 8 == 0:
+            layout.setEnabled(False)
+        widget.show()
+        if index % 8 == 7:
+            layout.setEnabled(True)
+            app.processEvents()
+    layout.setEnabled(True)
+    app.processEvents()
+    create = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for width in WIDTHS:
+        window.resize(width, 800)
+        app.processEvents()
+    resize = (time.perf_counter() - started) / len(WIDTHS)
+
+    started = time.perf_counter()
+    for _ in range(100):
+        layout.heightForWidth(WIDTHS[-1])
+    height = (time.perf_counter() - started) / 100
+
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return create, resize, height
+
+
+def main():
+    module, app = load_gui_module()
+    if module is None:
+        print("PyQt6 is not installed, nothing to measure")
+        return
+    print(f"{'dials':>6} {'create ms':>10} {'resize ms':>10} {'height us':>10}")
+    for dial_count in DIAL_COUNTS:
+        create, resize, height = bench(module, app, dial_count)
+        print(f"{dial_count:>6} {create * 1000:>10.2f} {resize * 1000:>10.2f} "
+              f"{height * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark: dial updates on a healthy server while a second server is slow or down
+
+Runs 16 dials on a fast mock server, alone and together with 16 dials on a
+second mock server that takes longer than the set timeout to answer, and
+with a second server that refuses connections. Reports the pass latency and
+the writes per second that reach the healthy server, which should not
+change when the other server fails.
+
+    python benchmarks/bench_multi_server.py
+"""
+import contextlib
+import io
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockVU1Server
+from vu1_client import ServerPool, VU1Client
+from vu1_engine import DialUpdater
+from vu1_metrics import Metrics
+from vu1_replay import SyntheticSource
+
+DIALS = 16
+RATE = 10  # update passes per second
+DURATION = 5.0
+
+
+def closed_port_url():
+    """Returns the URL of a local port nobody listens on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def run(healthy, other_url=None):
+    metrics = Metrics()
+    clients = [VU1Client(healthy.url, healthy.api_key, name="healthy", metrics=metrics,
+                         max_concurrency=8)]
+    if other_url:
+        clients.append(VU1Client(other_url, "benchmark", name="other", metrics=metrics,
+                                 timeouts={"set": 0.5, "list": 0.5}, retries=0,
+                                 max_concurrency=8))
+    pool = ServerPool(clients)
+    pool.list_dials()
+    dial_ids = list(healthy.dials)
+    if other_url:
+        # The other server may not answer the listing, place its dials by hand
+        other_ids = [f"OTHER{i:04d}" for i in range(DIALS)]
+        pool.set_dial_servers({dial_id: "other" for dial_id in other_ids})
+        dial_ids += other_ids
+    source = SyntheticSource(len(dial_ids), period=7)
+    updater = DialUpdater(pool, source, metrics=metrics, tick_deadline=0.9)
+    updater.set_assignments({dial_id: source.sensor_ids[i] for i, dial_id in enumerate(dial_ids)},
+                            {}, {})
+    healthy.reset_counts()
+    started = time.monotonic()
+    deadline = started
+    while time.monotonic() - started < DURATION:
+        deadline += 1 / RATE
+        updater.schedule_sensor_updates(dial_ids, 1 / RATE)
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.monotonic() - started
+    writes = healthy.reset_counts()["set"]
+    tick = metrics.snapshot()["timings"]["tick"]
+    updater.close(wait=True)
+    pool.close()
+    return writes / elapsed, tick["p50_ms"], tick["p95_ms"]
+
+
+def main():
+    healthy = MockVU1Server(DIALS, latency=0.005, uid_prefix="FAST").start()
+    slow = MockVU1Server(DIALS, latency=2.0, uid_prefix="OTHER").start()
+    target = DIALS * RATE
+    print(f"{DIALS} dials per server at {RATE} passes/s, {target} writes/s intended")
+    print(f"{'second server':>16} {'healthy writes/s':>17} {'p50 ms':>8} {'p95 ms':>8}")
+    try:
+        for label, url in (("none", None), ("slow (2 s)", slow.url),
+                           ("refusing", closed_port_url())):
+            # The failing writes print one error each
+            with contextlib.redirect_stdout(io.StringIO()):
+                writes, p50, p95 = run(healthy, url)
+            print(f"{label:>16} {writes:>17.0f} {p50:>8.1f} {p95:>8.1f}")
+    finally:
+        healthy.stop()
+        slow.stop()
+
+
+if __name__ == "__main__":
+    main()
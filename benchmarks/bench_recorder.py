@@ -0,0 +1,49 @@
+"""Benchmark: cost of recording every sensor sample and of reading a time range back
+
+Records a simulated day at one sample per second (86400 rows, one-hour
+segments) for 16, 64 and 256 sensors into a temporary folder, then reads one
+hour and the whole day back with read_range().
+
+    python benchmarks/bench_recorder.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_recorder import SensorRecorder, list_segments, read_range
+
+ROWS = 86400
+START = 1700000000.0
+
+
+def main():
+    import numpy  # noqa: F401, keep the import time out of the first read
+    print(f"{'sensors':>8} {'record us':>10} {'disk MB':>8} {'hour ms':>8} {'day ms':>7}")
+    for sensor_count in (16, 64, 256):
+        index = {f"S{i}": str(i % 100) for i in range(sensor_count)}
+        with tempfile.TemporaryDirectory() as folder:
+            recorder = SensorRecorder(folder, segment_rows=3600, max_bytes=2 ** 40)
+            started = time.perf_counter()
+            for row in range(ROWS):
+                recorder.record(START + row, index)
+            record_time = (time.perf_counter() - started) / ROWS * 1e6
+            recorder.close()
+            disk = sum(os.path.getsize(path) for path in list_segments(folder)) / 2 ** 20
+
+            started = time.perf_counter()
+            timestamps, values = read_range(folder, START + 7200.5, START + 10800.5)
+            hour_time = (time.perf_counter() - started) * 1000
+            assert len(timestamps) == 3600 and len(values) == sensor_count
+            started = time.perf_counter()
+            timestamps, _ = read_range(folder)
+            day_time = (time.perf_counter() - started) * 1000
+            assert len(timestamps) == ROWS
+        print(f"{sensor_count:>8} {record_time:>10.1f} {disk:>8.1f} {hour_time:>8.1f} "
+              f"{day_time:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
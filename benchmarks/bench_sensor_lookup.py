@@ -0,0 +1,79 @@
+"""Micro-benchmark: cost of one dial update tick as sensor and dial counts grow
+
+Compares the old per-dial linear scan over the AIDA64 snapshot with the
+id -> value index that is built once per snapshot.
+
+    python benchmarks/bench_sensor_lookup.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_sensors import build_sensor_index, parse_sensor_id
+
+CATEGORIES = ["sys", "temp", "fan", "duty", "volt", "curr", "pwr"]
+
+
+def make_snapshot(sensor_count):
+    """Builds a fake getData() result with sensor_count sensors"""
+    data = {category: [] for category in CATEGORIES}
+    for i in range(sensor_count):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        data[category].append({
+            "id": f"S{category.upper()}{i}",
+            "label": f"Sensor {i}",
+            "value": str(random.uniform(0, 100)),
+        })
+    return data
+
+
+def make_assignments(data, dial_count):
+    """Assigns random sensors to dial_count dials as "label (id)" strings"""
+    items = [item for category in data.values() for item in category]
+    return {f"dial{i}": f"{item['label']} ({item['id']})"
+            for i, item in enumerate(random.sample(items, dial_count))}
+
+
+def legacy_tick(data, assignments):
+    """The old lookup: parse the assignment and scan all categories per dial"""
+    for sensor in assignments.values():
+        sensor_id = sensor.split('(')[-1].strip(')')
+        for category in data.values():
+            if isinstance(category, list):
+                found = next((item for item in category if item['id'] == sensor_id), None)
+                if found:
+                    float(found['value'])
+                    break
+
+
+def indexed_tick(data, sensor_ids):
+    """The new lookup: index the snapshot once, then one hash lookup per dial"""
+    index = build_sensor_index(data)
+    for sensor_id in sensor_ids.values():
+        value = index.get(sensor_id)
+        if value is not None:
+            float(value)
+
+
+def main():
+    random.seed(1)
+    print(f"{'sensors':>8} {'dials':>6} {'legacy us':>10} {'indexed us':>11} {'speedup':>8}")
+    for sensor_count in (50, 200, 500, 1000):
+        data = make_snapshot(sensor_count)
+        for dial_count in (1, 4, 12, 32):
+            assignments = make_assignments(data, dial_count)
+            sensor_ids = {dial_id: parse_sensor_id(text) for dial_id, text in assignments.items()}
+            runs = 200
+            legacy = min(timeit.repeat(lambda: legacy_tick(data, assignments),
+                                       number=runs, repeat=3)) / runs * 1e6
+            indexed = min(timeit.repeat(lambda: indexed_tick(data, sensor_ids),
+                                        number=runs, repeat=3)) / runs * 1e6
+            print(f"{sensor_count:>8} {dial_count:>6} {legacy:>10.1f} {indexed:>11.1f} "
+                  f"{legacy / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark: per-tick acquisition cost of the sensor backends
+
+Builds a fake /sys/class/hwmon and /proc tree in a temporary folder and
+compares HwmonSource (files kept open, re-read with pread) with a reader
+that reopens every file on each tick. AIDA64Source is measured as well
+when python_aida64 is available (Windows with AIDA64 running).
+
+    python benchmarks/bench_sensor_sources.py
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_sensors import AIDA64Source, HwmonSource
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def make_fake_tree(root, chip_count, sensors_per_chip):
+    """Creates hwmon chips with temp/fan/in sensors plus /proc/stat and /proc/meminfo"""
+    hwmon_root = os.path.join(root, "sys", "class", "hwmon")
+    proc_root = os.path.join(root, "proc")
+    kinds = [("temp", "45000"), ("fan", "1200"), ("in", "1200")]
+    for chip in range(chip_count):
+        chip_path = os.path.join(hwmon_root, f"hwmon{chip}")
+        write(os.path.join(chip_path, "name"), f"chip{chip}\n")
+        for i in range(sensors_per_chip):
+            kind, value = kinds[i % len(kinds)]
+            number = i // len(kinds) + 1
+            write(os.path.join(chip_path, f"{kind}{number}_input"), value + "\n")
+            write(os.path.join(chip_path, f"{kind}{number}_label"), f"Sensor {i}\n")
+    write(os.path.join(proc_root, "stat"), "cpu  6216 0 1274 106236 302 0 3 1106 0 0\n")
+    write(os.path.join(proc_root, "meminfo"),
+          "MemTotal:        6158152 kB\nMemFree:         4550288 kB\n"
+          "MemAvailable:    5659964 kB\n")
+    return hwmon_root, proc_root
+
+
+class ReopenHwmonSource(HwmonSource):
+    """The naive approach: open, read and close every file on each tick"""
+
+    def _scan(self):
+        super()._scan()
+        self._paths = {fd: os.readlink(f"/proc/self/fd/{fd}") for fd, *_ in self._sensors}
+
+    def _read_value(self, fd):
+        with open(self._paths[fd], "r") as file:
+            return int(file.read())
+
+
+def measure(source, runs=200):
+    """Returns the best per-tick read time in microseconds"""
+    return min(timeit.repeat(source.read, number=runs, repeat=3)) / runs * 1e6
+
+
+def main():
+    print(f"{'sensors':>8} {'pread us':>9} {'reopen us':>10} {'speedup':>8}")
+    for chip_count, sensors_per_chip in ((1, 6), (4, 12), (8, 24), (16, 32)):
+        with tempfile.TemporaryDirectory() as root:
+            hwmon_root, proc_root = make_fake_tree(root, chip_count, sensors_per_chip)
+            kept_open = HwmonSource(hwmon_root, proc_root)
+            reopened = ReopenHwmonSource(hwmon_root, proc_root)
+            pread_time = measure(kept_open)
+            reopen_time = measure(reopened)
+            kept_open.close()
+            reopened.close()
+        print(f"{chip_count * sensors_per_chip:>8} {pread_time:>9.1f} {reopen_time:>10.1f} "
+              f"{reopen_time / pread_time:>7.1f}x")
+
+    try:
+        source = AIDA64Source()
+        print(f"aida64: {measure(source, runs=50):.1f} us per tick")
+    except ImportError:
+        print("aida64: skipped, python_aida64 is not installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Local stand-in for the VU1 server, for benchmarks and testing without hardware
+
+Implements the dial endpoints the GUI uses (list, status, set, backlight,
+image get/set, name, easing) for a configurable number of fake dials, with
+optional latency and error rate per request. Run it on its own and point
+the GUI to it, e.g.
+
+    python benchmarks/mock_server.py --dials 8 --latency 5 --port 5340
+
+or start it from a benchmark with MockVU1Server(...).start().
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def blank_png(width=200, height=144):
+    """Returns a white greyscale PNG the size of the dial display"""
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data)))
+    raw = b"".join(b"\x00" + b"\xff" * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+    # Headers and body are separate writes, Nagle would hold the body back 40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(status, json.dumps({"status": "ok", "data": data}).encode())
+
+    def _handle(self):
+        server = self.server.mock
+        if server.stopped:
+            # Kept-alive connections end like they do when the real server goes down
+            self.close_connection = True
+            return
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if self.command == "POST":
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        else:
+            body = b""
+        parts = url.path.strip("/").split("/")  # api, v0, dial, <uid>|list, ...
+        endpoint = "list" if parts[3:4] == ["list"] else "/".join(parts[4:])
+        server.count(endpoint)
+
+        if server.latency:
+            time.sleep(server.latency)
+        if query.get("key") != server.api_key:
+            return self._send(401, b'{"status": "fail", "message": "Invalid key"}')
+        if server.error_rate and random.random() < server.error_rate:
+            return self._send(server.error_status,
+                              b'{"status": "fail", "message": "Injected error"}')
+        if endpoint == "list":
+            return self._send_json([{"uid": uid, "dial_name": dial["dial_name"]}
+                                    for uid, dial in server.dials.items()])
+
+        dial = server.dials.get(parts[3])
+        if dial is None:
+            return self._send(404, b'{"status": "fail", "message": "Unknown dial"}')
+        if endpoint == "status":
+            return self._send_json(dial)
+        if endpoint == "set":
+            dial["value"] = int(float(query.get("value", 0)))
+        elif endpoint == "backlight":
+            dial["backlight"] = {channel: int(query.get(channel, 0))
+                                 for channel in ("red", "green", "blue")}
+        elif endpoint == "name":
+            dial["dial_name"] = query.get("name", "")
+        elif endpoint == "easing/dial":
+            dial["easing"] = {"dial_period": int(query.get("period", 50)),
+                              "dial_step": int(query.get("step", 5))}
+        elif endpoint == "image/get":
+            image = server.images[parts[3]]
+            etag = '"' + hashlib.sha1(image).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, headers={"ETag": etag})
+            return self._send(200, image, "image/png", {"ETag": etag})
+        elif endpoint == "image/set":
+            # Good enough for multipart bodies with a single file part
+            start = body.find(b"\x89PNG")
+            end = body.rfind(b"\r\n--")
+            server.images[parts[3]] = body[start:end] if start >= 0 else body
+        else:
+            return self._send(404, b'{"status": "fail", "message": "Unknown endpoint"}')
+        self._send_json({})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients closing keep-alive connections are not errors
+
+
+class MockVU1Server:
+    """A fake VU1 server with dial_count dials, latency in seconds and an error rate of 0-1
+
+    Injected errors are answered with error_status, e.g. 503 like a proxy in
+    front of a server that is down.
+    """
+
+    def __init__(self, dial_count=8, latency=0.0, error_rate=0.0, api_key="benchmark",
+                 host="127.0.0.1", port=0, uid_prefix="MOCK", error_status=500):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api_key = api_key
+        image = blank_png()
+        self.dials = {}
+        self.images = {}
+        for i in range(dial_count):
+            uid = f"{uid_prefix}{i:04d}"
+            self.dials[uid] = {"uid": uid, "dial_name": f"Dial {i}", "value": 0,
+                               "backlight": {"red": 0, "green": 0, "blue": 0},
+                               "easing": {"dial_period": 50, "dial_step": 5}}
+            self.images[uid] = image
+        self.requests = Counter()
+        self.stopped = False
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] += 1
+
+    def reset_counts(self):
+        """Clears the request counters and returns the old ones"""
+        with self._lock:
+            requests, self.requests = self.requests, Counter()
+        return requests
+
+    def start(self):
+        """Serves requests on a background thread and returns self"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake VU1 server for testing without hardware")
+    parser.add_argument("--dials", type=int, default=4, help="number of fake dials")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="delay per request in milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of requests answered with an error, 0-1")
+    parser.add_argument("--error-status", type=int, default=500,
+                        help="HTTP status of the injected errors, e.g. 503")
+    parser.add_argument("--api-key", default="benchmark")
+    parser.add_argument("--port", type=int, default=5340)
+    parser.add_argument("--uid-prefix", default="MOCK",
+                        help="start of the dial UIDs, to run several servers side by side")
+    args = parser.parse_args()
+
+    server = MockVU1Server(args.dials, args.latency / 1000, args.error_rate, args.api_key,
+                           port=args.port, uid_prefix=args.uid_prefix,
+                           error_status=args.error_status)
+    print(f"Mock VU1 server with {args.dials} dials on {server.url}, key {args.api_key}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
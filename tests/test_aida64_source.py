@@ -0,0 +1,82 @@
+"""AIDA64SharedMemorySource against a file standing in for the shared memory
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_sensors import AIDA64SharedMemorySource, build_sensor_index
+
+BLOCK = ("<sys><id>SCPUUTI</id><label>CPU Utilization</label><value>12</value></sys>"
+         "<temp><id>TCPU</id><label>CPU</label><value>45</value></temp>"
+         "<temp><id>TGPU1</id><label>GPU</label><value>60</value></temp>"
+         "<fan><id>A&amp;B</id><label>Fan A&amp;B</label><value>900</value></fan>")
+
+
+def write_block(path, text, padding=4096):
+    data = text.encode()
+    with open(path, "wb") as file:
+        file.write(data + b"\x00" * (padding - len(data)) if padding else data)
+
+
+@pytest.fixture
+def block_file(tmp_path):
+    path = str(tmp_path / "aida64.bin")
+    write_block(path, BLOCK)
+    return path
+
+
+def test_catalog_lists_all_sensors_of_a_nul_padded_file(block_file):
+    source = AIDA64SharedMemorySource(block_file)
+    index = build_sensor_index(source.read_catalog())
+    assert index == {"SCPUUTI": "12", "TCPU": "45", "TGPU1": "60", "A&B": "900"}
+    source.close()
+
+
+def test_read_returns_only_the_wanted_sensors(block_file):
+    source = AIDA64SharedMemorySource(block_file)
+    assert source.read() == {}
+    source.set_wanted_ids(["TGPU1", "SCPUUTI", "MISSING"])
+    assert source.read() == {
+        "sys": [{"id": "SCPUUTI", "label": "CPU Utilization", "value": "12"}],
+        "temp": [{"id": "TGPU1", "label": "GPU", "value": "60"}]}
+    source.close()
+
+
+def test_escaped_ids_are_found_by_their_catalog_name(block_file):
+    source = AIDA64SharedMemorySource(block_file)
+    source.set_wanted_ids(["A&B"])
+    assert source.read() == {"fan": [{"id": "A&B", "label": "Fan A&B", "value": "900"}]}
+    source.close()
+
+
+def test_unchanged_block_is_not_parsed_again(block_file):
+    source = AIDA64SharedMemorySource(block_file)
+    source.set_wanted_ids(["TCPU"])
+    first = source.read()
+    source._find_entry = None  # any parse would fail now
+    assert source.read() is first
+    source.close()
+
+
+def test_changed_block_is_parsed_again(block_file):
+    source = AIDA64SharedMemorySource(block_file)
+    source.set_wanted_ids(["TCPU"])
+    assert build_sensor_index(source.read()) == {"TCPU": "45"}
+    write_block(block_file, BLOCK.replace("<value>45</value>", "<value>47</value>"))
+    assert build_sensor_index(source.read()) == {"TCPU": "47"}
+    source.close()
+
+
+def test_unterminated_block_warns_once(tmp_path, capsys):
+    path = str(tmp_path / "aida64.bin")
+    write_block(path, BLOCK, padding=0)
+    source = AIDA64SharedMemorySource(path)
+    assert len(build_sensor_index(source.read_catalog())) == 4
+    source.read_catalog()
+    assert capsys.readouterr().out.count("does not end within") == 1
+    source.close()
@@ -0,0 +1,147 @@
+"""Circuit breaker of VU1Client against the mock server
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from mock_server import MockVU1Server
+from vu1_client import UNREACHABLE_ERRORS, CircuitBreaker, ServerUnavailable, VU1Client
+from vu1_engine import ChangeFilter, DialScheduler, DialUpdater
+from vu1_sensors import SensorSource
+
+
+@pytest.fixture
+def server():
+    server = MockVU1Server(2).start()
+    yield server
+    server.stop()
+
+
+def make_client(server, **breaker_options):
+    breaker = CircuitBreaker(**dict({"failure_threshold": 3, "backoff": 60.0}, **breaker_options))
+    return VU1Client(server.url, server.api_key, retries=1, backoff_factor=0,
+                     breaker=breaker)
+
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_server_errors_open_the_breaker(server, status):
+    # 503 goes through the retrying adapter and ends as a RetryError
+    server.error_rate, server.error_status = 1.0, status
+    client = make_client(server)
+    dial_id = next(iter(server.dials))
+    for _ in range(3):
+        with pytest.raises(UNREACHABLE_ERRORS + (requests.HTTPError,)):
+            client.set_value(dial_id, 50)
+    assert client.breaker.state == CircuitBreaker.OPEN
+    sent = sum(server.reset_counts().values())
+    with pytest.raises(ServerUnavailable):
+        client.set_value(dial_id, 50)
+    assert sum(server.reset_counts().values()) == 0 < sent
+    client.close()
+
+
+def test_client_errors_do_not_open_the_breaker(server):
+    client = make_client(server)
+    for _ in range(5):
+        with pytest.raises(requests.HTTPError):
+            client.set_value("UNKNOWN", 50)  # 404
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    client.close()
+
+
+def test_probe_closes_the_breaker_and_calls_listeners(server):
+    server.error_rate, server.error_status = 1.0, 503
+    client = make_client(server, backoff=0.0)
+    recovered = []
+    client.add_recovery_listener(recovered.append)
+    dial_id = next(iter(server.dials))
+    for _ in range(3):
+        with pytest.raises(UNREACHABLE_ERRORS):
+            client.set_value(dial_id, 50)
+    assert client.breaker.state == CircuitBreaker.OPEN
+    server.error_rate = 0.0
+    client.set_value(dial_id, 70)
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert recovered == [client.name]
+    assert server.dials[dial_id]["value"] == 70
+    client.close()
+
+
+def test_read_timeouts_are_not_sent_twice(server):
+    server.latency = 0.3
+    client = make_client(server)
+    dial_id = next(iter(server.dials))
+    with pytest.raises(requests.Timeout):
+        client.set_value(dial_id, 50, timeout=0.1)
+    assert server.reset_counts()["set"] == 1
+    client.close()
+
+
+def test_connections_closed_by_a_restart_are_retried(server):
+    client = make_client(server)
+    dial_id = next(iter(server.dials))
+    client.set_value(dial_id, 10)  # leaves a kept-alive connection in the pool
+    port = server._server.server_address[1]
+    server.stop()
+    restarted = MockVU1Server(2, port=port).start()
+    try:
+        client.set_value(dial_id, 20)
+        assert restarted.dials[dial_id]["value"] == 20
+        assert client.breaker.failures == 0
+    finally:
+        restarted.stop()
+        client.close()
+
+
+class ConstantSource(SensorSource):
+    name = "constant"
+
+    def read(self):
+        return {"sys": [{"id": "LOAD", "label": "Load", "value": "50"}]}
+
+
+def test_short_restart_is_noticed_while_values_are_steady(server):
+    client = make_client(server, backoff=0.1)
+    updater = DialUpdater(client, ConstantSource(), ChangeFilter(refresh_interval=30.0),
+                          scheduler=DialScheduler(0.05), probe_interval=0.1)
+    recovered = []
+    client.add_recovery_listener(recovered.append)
+    dial_id = next(iter(server.dials))
+    updater.set_assignments({dial_id: "LOAD"}, {dial_id: 0}, {dial_id: 100})
+    thread = threading.Thread(target=updater.run, daemon=True)
+    thread.start()
+    port = server._server.server_address[1]
+    restarted = None
+    try:
+        assert wait_for(lambda: server.dials[dial_id]["value"] == 50)
+        server.stop()
+        time.sleep(0.5)  # shorter than the refresh interval
+        restarted = MockVU1Server(2, port=port).start()
+        assert wait_for(lambda: restarted.dials[dial_id]["value"] == 50)
+        assert recovered == [client.name]
+    finally:
+        updater.stop()
+        thread.join(2)
+        updater.close(wait=True)
+        client.close()
+        if restarted:
+            restarted.stop()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
@@ -0,0 +1,83 @@
+"""HwmonSource against a fake sysfs and /proc tree
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vu1_sensors import HwmonSource, build_sensor_index
+
+MEMINFO = "MemTotal:       16000000 kB\nMemFree:         2000000 kB\nMemAvailable:    4000000 kB\n"
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def write_stat(proc_root, idle, total):
+    # user nice system idle iowait, the busy time goes into user
+    write(os.path.join(proc_root, "stat"), f"cpu  {total - idle} 0 0 {idle} 0\ncpu0 0 0 0 0 0\n")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    hwmon_root = str(tmp_path / "hwmon")
+    proc_root = str(tmp_path / "proc")
+    write(os.path.join(hwmon_root, "hwmon0", "name"), "k10temp\n")
+    write(os.path.join(hwmon_root, "hwmon0", "temp1_input"), "45500\n")
+    write(os.path.join(hwmon_root, "hwmon0", "temp1_label"), "Tctl\n")
+    write(os.path.join(hwmon_root, "hwmon1", "name"), "nct6775\n")
+    write(os.path.join(hwmon_root, "hwmon1", "fan1_input"), "1200\n")
+    write(os.path.join(hwmon_root, "hwmon1", "fan1_min"), "300\n")  # not a reading
+    write(os.path.join(hwmon_root, "hwmon2", "name"), "nct6775\n")
+    write(os.path.join(hwmon_root, "hwmon2", "in0_input"), "1250\n")
+    write_stat(proc_root, 1000, 2000)
+    write(os.path.join(proc_root, "meminfo"), MEMINFO)
+    return hwmon_root, proc_root
+
+
+def test_reads_sensors_with_ids_labels_and_units(tree):
+    source = HwmonSource(*tree)
+    data = source.read()
+    assert data["temp"] == [{"id": "HW.k10temp.temp1", "label": "k10temp Tctl", "value": 45.5}]
+    assert data["fan"] == [{"id": "HW.nct6775.fan1", "label": "nct6775 fan1", "value": 1200}]
+    # A second chip with the same driver name gets a numbered ID
+    assert data["volt"] == [{"id": "HW.nct6775#2.in0", "label": "nct6775 in0", "value": 1.25}]
+    index = build_sensor_index(data)
+    assert index["SMEMUTI"] == 75.0
+    assert index["SCPUUTI"] == 0.0  # no earlier reading to compare with yet
+    source.close()
+
+
+def test_changed_values_are_read_again(tree):
+    hwmon_root, proc_root = tree
+    source = HwmonSource(hwmon_root, proc_root)
+    source.read()
+    write(os.path.join(hwmon_root, "hwmon0", "temp1_input"), "51000\n")
+    write_stat(proc_root, 1100, 2400)  # 300 of 400 ticks busy
+    index = build_sensor_index(source.read())
+    assert index["HW.k10temp.temp1"] == 51.0
+    assert index["SCPUUTI"] == 75.0
+    source.close()
+
+
+def test_unreadable_sensor_is_skipped(tree):
+    hwmon_root, proc_root = tree
+    source = HwmonSource(hwmon_root, proc_root)
+    write(os.path.join(hwmon_root, "hwmon1", "fan1_input"), "")
+    index = build_sensor_index(source.read())
+    assert "HW.nct6775.fan1" not in index
+    assert index["HW.k10temp.temp1"] == 45.5
+    source.close()
+
+
+def test_missing_trees_give_an_empty_snapshot(tmp_path):
+    source = HwmonSource(str(tmp_path / "none"), str(tmp_path / "none"))
+    assert build_sensor_index(source.read()) == {}
+    source.close()
@@ -0,0 +1,191 @@
+"""Headless VU1 dial updater without PyQt
+
+Reads the settings.json and assignments.json written by the GUI and runs
+only the sensor acquisition and dial update loop, e.g. as a service:
+
+    python vu1-dials-daemon.py [--config-dir DIR]
+
+Stop it with Ctrl+C or SIGTERM, the dials are then set to 0 and their
+backlights turned off like when the GUI is closed.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+
+from vu1_client import ServerUnavailable, pool_from_settings
+from vu1_engine import ChangeFilter, DialScheduler, DialUpdater
+from vu1_metrics import Metrics, MetricsServer
+from vu1_persistence import write_json_atomic
+from vu1_recorder import recorder_from_settings
+from vu1_sensors import parse_sensor_id, sensor_source_from_settings
+
+
+def default_config_dir():
+    """Returns the folder of the executable or script, where the GUI keeps its files"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def load_json(path):
+    """Returns the parsed JSON file, or an empty dict if it is missing or broken"""
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
+        return {}
+
+
+def backlight_percent(red, green, blue):
+    """Convert RGB (0-255) to percentage values (0-100)"""
+    return int((red / 255) * 100), int((green / 255) * 100), int((blue / 255) * 100)
+
+
+class Daemon:
+    """Drives the dials from the saved assignments until it is stopped"""
+
+    def __init__(self, settings, assignments, assignments_file=None, base_path=None):
+        self.settings = settings
+        self.assignments_file = assignments_file
+        self.assignments = assignments
+        self.metrics = Metrics()
+        self.metrics_server = None
+        self.client = pool_from_settings(settings, self.metrics)
+        self.client.set_dial_servers(assignments.get("dial_servers", {}))
+        self.source = sensor_source_from_settings(settings)
+        change_filter = ChangeFilter(settings.get("deadband_abs", 0.0),
+                                     settings.get("deadband_pct", 0.0),
+                                     settings.get("refresh_interval", 30.0))
+        self.updater = DialUpdater(self.client, self.source, change_filter,
+                                   max_concurrency=settings.get("max_concurrency", 8),
+                                   tick_deadline=settings.get("tick_deadline", 0.9),
+                                   scheduler=DialScheduler(
+                                       settings.get("update_interval", 1000) / 1000),
+                                   metrics=self.metrics,
+                                   recorder=recorder_from_settings(
+                                       settings, base_path or default_config_dir()),
+                                   probe_interval=settings.get("probe_interval", 5.0))
+        sensor_ids = {dial_id: parse_sensor_id(text) for dial_id, text
+                      in assignments.get("sensor_assignments", {}).items()}
+        intervals = {dial_id: ms / 1000 for dial_id, ms
+                     in assignments.get("update_intervals", {}).items()}
+        self.updater.set_assignments(sensor_ids, assignments.get("min_values", {}),
+                                     assignments.get("max_values", {}), intervals,
+                                     assignments.get("filters", {}),
+                                     assignments.get("expressions", {}))
+        self.updater.set_auto_ranges(assignments.get("auto_ranges", {}),
+                                     assignments.get("learned_ranges", {}),
+                                     settings.get("auto_range_window", 3600))
+        self.dial_ids = list(sensor_ids) + list(assignments.get("expressions", {}))
+        # A server that comes back gets its backlights with the values of the next pass
+        self.client.add_recovery_listener(self.restore_backlights)
+
+    def restore_backlights(self, server=None):
+        """Queues the backlight levels stored by the GUI, only for the dials of server if given"""
+        for dial_id, levels in self.assignments.get("backlight_values", {}).items():
+            if server and self.client.client_for(dial_id).name != server:
+                continue
+            try:
+                self.updater.commands.submit(dial_id, "backlight", self._set_backlight,
+                                             dial_id, levels)
+            except Exception as e:
+                print(f"Error restoring backlight for Dial {dial_id}: {e}")
+
+    def _set_backlight(self, dial_id, levels):
+        try:
+            self.client.set_backlight(dial_id, *backlight_percent(
+                levels["red"], levels["green"], levels["blue"]))
+        except ServerUnavailable:
+            pass  # sent again when the server is back
+        except Exception as e:
+            print(f"Error restoring backlight for Dial {dial_id}: {e}")
+
+    def run(self):
+        """Runs the update loop in the calling thread until stop() is called"""
+        if self.settings.get("metrics_port"):
+            try:
+                self.metrics_server = MetricsServer(self.metrics, self.settings["metrics_port"])
+            except Exception as e:
+                print(f"Error starting the metrics endpoint: {e}")
+        try:
+            # Learn which server each dial is on, servers that are down keep
+            # the locations saved by the GUI
+            self.client.list_dials()
+        except Exception as e:
+            print(f"Error listing dials: {e}")
+        self.restore_backlights()
+        self.updater.run()
+
+    def stop(self, *args):
+        """Ends the update loop, safe to call from a signal handler"""
+        self.updater.stop()
+
+    def save_learned_ranges(self):
+        """Writes the learned value ranges back to assignments.json"""
+        if not self.assignments_file or not self.assignments.get("auto_ranges"):
+            return
+        try:
+            # Re-read the file in case the GUI changed it in the meantime
+            assignments = load_json(self.assignments_file)
+            learned = assignments.get("learned_ranges", {})
+            learned.update(self.updater.learned_ranges())
+            assignments["learned_ranges"] = learned
+            write_json_atomic(self.assignments_file, assignments)
+        except Exception as e:
+            print(f"Error saving the learned ranges: {e}")
+
+    def shutdown_dials(self):
+        """Set all dials to 0 and turn off the light."""
+        self.updater.close()
+        self.save_learned_ranges()
+        if self.metrics_server:
+            self.metrics_server.close()
+        try:
+            dial_ids = [dial["uid"] for dial in self.client.list_dials()]
+        except Exception as e:
+            print(f"Error listing dials, only resetting assigned ones: {e}")
+            dial_ids = self.dial_ids
+        for dial_id in dial_ids:
+            try:
+                self.client.set_value(dial_id, 0, timeout=1)
+                self.client.set_backlight(dial_id, 0, 0, 0, timeout=1)
+            except Exception as e:
+                print(f"Error shutting down dial {dial_id}: {e}")
+        self.source.close()
+        self.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless VU1 dial updater")
+    parser.add_argument("--config-dir", default=default_config_dir(),
+                        help="folder with settings.json and assignments.json")
+    args = parser.parse_args()
+
+    settings = load_json(os.path.join(args.config_dir, "settings.json"))
+    if not settings.get("server_address") or not settings.get("api_key"):
+        print("settings.json needs server_address and api_key, configure them in the GUI first")
+        return 1
+    assignments_file = os.path.join(args.config_dir, "assignments.json")
+    assignments = load_json(assignments_file)
+
+    daemon = Daemon(settings, assignments, assignments_file, args.config_dir)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    print(f"Updating {len(daemon.dial_ids)} dials from {daemon.source.name}")
+    try:
+        daemon.run()
+    finally:
+        daemon.shutdown_dials()
+        stats = daemon.updater.change_filter.stats()
+        print(f"Writes sent: {stats['sent']}, suppressed: {stats['suppressed']}, "
+              f"late: {daemon.updater.overruns}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
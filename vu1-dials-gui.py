@@ -1,17 +1,39 @@
 import sys
 import os
 import json
+import time
 import requests
-import winreg
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
     QHBoxLayout, QLabel, QPushButton, QLineEdit, QComboBox, QCheckBox,
     QSpinBox, QColorDialog, QFileDialog, QMessageBox, QDialog, QFrame, QLayout,
-    QSystemTrayIcon, QMenu, QStyle)
-from PyQt6.QtCore import Qt, QTimer, QSize, QRect, QPoint, QEvent, QObject
+    QSystemTrayIcon, QMenu, QStyle, QCompleter, QTableWidget, QTableWidgetItem,
+    QHeaderView)
+from PyQt6.QtCore import (Qt, QTimer, QSize, QRect, QPoint, QEvent,
+    QThread, pyqtSignal, QStringListModel)
 from PyQt6.QtGui import QImage, QPixmap, QColor, QAction, QIcon
-from PIL import Image
-from io import BytesIO
-from python_aida64 import getData
+from concurrent.futures import ThreadPoolExecutor
+from vu1_sensors import (parse_sensor_id, build_sensor_catalog, create_sensor_source,
+    sensor_source_from_settings, read_snapshot)
+from vu1_engine import DialUpdater, ChangeFilter, DialScheduler
+from vu1_commands import INTERACTIVE, SUPERSEDED
+from vu1_client import UNREACHABLE_ERRORS, VU1Client, ServerUnavailable, pool_from_settings
+from vu1_image_cache import DialImageCache
+from vu1_image_prep import prepare_dial_image
+from vu1_metrics import Metrics, MetricsServer
+from vu1_recorder import recorder_from_settings
+from vu1_persistence import JsonStore
+from vu1_expressions import compile_expression
+
+# Size of the dial image preview, thumbnails are cached at this size
+DIAL_IMAGE_SIZE = QSize(200, 144)
+
+class SensorComboBox(QComboBox):
+    """Combo box that announces when its list is about to be shown"""
+    popup_about_to_show = pyqtSignal()
+
+    def showPopup(self):
+        self.popup_about_to_show.emit()
+        super().showPopup()
 
 class DialWidget(QFrame):
     def __init__(self, parent=None, dial_id=None):
@@ -30,7 +52,7 @@ class DialWidget(QFrame):
 
         # Image Label
         self.image_label = QLabel()
-        self.image_label.setFixedSize(200, 144)
+        self.image_label.setFixedSize(DIAL_IMAGE_SIZE)
         self.layout.addWidget(self.image_label)
 
         # Set Image Button
@@ -65,10 +87,12 @@ class DialWidget(QFrame):
         backlight_layout.addWidget(self.save_backlight_btn)
         self.layout.addWidget(backlight_frame)
 
-        # Sensor Selection
-        self.sensor_combo = QComboBox()
+        # Sensor Selection, editable for type-ahead search
+        self.sensor_combo = SensorComboBox()
+        self.sensor_combo.setEditable(True)
+        self.sensor_combo.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
         self.assign_sensor_btn = QPushButton("Assign Sensor")
-        self.layout.addWidget(QLabel("AIDA64 Sensor:"))
+        self.layout.addWidget(QLabel("Sensor:"))
         self.layout.addWidget(self.sensor_combo)
         self.layout.addWidget(self.assign_sensor_btn)
 
@@ -83,8 +107,39 @@ class DialWidget(QFrame):
         range_layout.addWidget(self.min_value)
         range_layout.addWidget(QLabel("Max Value:"))
         range_layout.addWidget(self.max_value)
+        self.range_mode = QComboBox()
+        self.range_mode.addItem("Manual", None)
+        self.range_mode.addItem("Auto (Min/Max)", 0)
+        self.range_mode.addItem("Auto (5-95 %)", 5)
+        range_layout.addWidget(QLabel("Range Mode:"))
+        range_layout.addWidget(self.range_mode)
+        self.learned_label = QLabel()
+        range_layout.addWidget(self.learned_label)
         self.save_range_btn = QPushButton("Save Range")
         range_layout.addWidget(self.save_range_btn)
+        self.interval_spin = QSpinBox()
+        self.interval_spin.setRange(50, 60000)
+        self.interval_spin.setSingleStep(50)
+        self.interval_spin.setValue(1000)
+        range_layout.addWidget(QLabel("Refresh Interval (ms):"))
+        range_layout.addWidget(self.interval_spin)
+        self.save_interval_btn = QPushButton("Save Interval")
+        range_layout.addWidget(self.save_interval_btn)
+
+        # Smoothing of spiky sensors
+        self.filter_combo = QComboBox()
+        for label, filter_type in (("None", "none"), ("Average (EMA)", "ema"),
+                                   ("Median", "median"), ("Peak Hold", "peak")):
+            self.filter_combo.addItem(label, filter_type)
+        self.filter_window = QSpinBox()
+        self.filter_window.setRange(2, 120)
+        self.filter_window.setValue(5)
+        range_layout.addWidget(QLabel("Filter:"))
+        range_layout.addWidget(self.filter_combo)
+        range_layout.addWidget(QLabel("Filter Window (samples):"))
+        range_layout.addWidget(self.filter_window)
+        self.save_filter_btn = QPushButton("Save Filter")
+        range_layout.addWidget(self.save_filter_btn)
         self.layout.addWidget(range_frame)
 
         # Easing Controls
@@ -115,6 +170,14 @@ class DialWidget(QFrame):
         
         self.layout.addWidget(easing_frame)
 
+    def set_sensor_model(self, model):
+        """Shares the sensor catalog model and searches it by substring while typing"""
+        self.sensor_combo.setModel(model)
+        completer = QCompleter(model, self.sensor_combo)
+        completer.setFilterMode(Qt.MatchFlag.MatchContains)
+        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.sensor_combo.setCompleter(completer)
+
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -137,6 +200,7 @@ class SettingsDialog(QDialog):
 
         # Autostart Option
         self.autostart = QCheckBox("Start with Windows")
+        self.autostart.setEnabled(sys.platform == "win32")
         layout.addWidget(self.autostart)
 
         # Start in Tray Option
@@ -148,14 +212,86 @@ class SettingsDialog(QDialog):
         self.save_btn.clicked.connect(self.accept)
         layout.addWidget(self.save_btn)
 
+class DiagnosticsDialog(QDialog):
+    """Shows the timings and counters of the update loop, refreshed every second"""
+    COLUMNS = ["Operation", "Count", "Errors", "Avg ms", "p50 ms", "p95 ms", "Max ms"]
+
+    def __init__(self, metrics, parent=None, servers=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.servers = servers  # ServerPool whose health is shown, or None
+        self.setWindowTitle("Diagnostics")
+        self.resize(620, 420)
+        layout = QVBoxLayout(self)
+
+        self.timings_table = QTableWidget(0, len(self.COLUMNS))
+        self.timings_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.timings_table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.ResizeToContents)
+        self.timings_table.verticalHeader().setVisible(False)
+        self.timings_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.timings_table)
+
+        self.servers_label = QLabel()
+        layout.addWidget(self.servers_label)
+
+        self.counters_label = QLabel()
+        layout.addWidget(self.counters_label)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        snapshot = self.metrics.snapshot()
+        timings = snapshot["timings"]
+        self.timings_table.setRowCount(len(timings))
+        for row, (name, summary) in enumerate(timings.items()):
+            values = [name, str(summary["count"]), str(summary["errors"])]
+            values += [f"{summary[key]:.1f}" for key in ("avg_ms", "p50_ms", "p95_ms", "max_ms")]
+            for column, value in enumerate(values):
+                self.timings_table.setItem(row, column, QTableWidgetItem(value))
+        counters = ", ".join(f"{name.removesuffix('_total').replace('_', ' ')}: {value}"
+                             for name, value in snapshot["counters"].items())
+        self.counters_label.setText(f"Uptime {snapshot['uptime_s']:.0f} s\n{counters}")
+        self.counters_label.setWordWrap(True)
+        if self.servers:
+            lines = []
+            for name, health in self.servers.health().items():
+                if health["state"] != "closed":
+                    state = f"unreachable, calls paused ({health['state']})"
+                else:
+                    state = "OK" if health["ok"] else f"failing: {health['last_error']}"
+                lines.append(f"Server {name}: {state}, {health['requests']} requests, "
+                             f"{health['failures']} failed, last {health['last_latency_ms']:.1f} ms")
+            self.servers_label.setText("\n".join(lines))
+            self.servers_label.setWordWrap(True)
+
 class FlowLayout(QLayout):
+    """Places the dial panels in rows that wrap at the available width
+
+    The positions are computed once per width and reused until an item is
+    added or removed, or Qt invalidates the layout because a panel changed
+    its size or was shown or hidden. Resizing the window back and forth and
+    the repeated heightForWidth() calls of the parent layouts then cost a
+    dictionary lookup.
+    """
+    SPACING = 10
+    MAX_CACHED_WIDTHS = 64
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._items = []
         self._rows = [] 
+        self._hints = None  # (item, size hint) of the visible items, None when stale
+        self._layouts = {}  # width -> (height, [(item, QRect)]) relative to the origin
+        self._minimum = None
+        self._applied = {}  # id(item) -> geometry last set on the item
 
     def addItem(self, item):
         self._items.append(item)
+        self._clear_cache()
 
     def count(self):
         return len(self._items)
@@ -167,9 +303,21 @@ class FlowLayout(QLayout):
 
     def takeAt(self, index):
         if 0 <= index < len(self._items):
-            return self._items.pop(index)
+            item = self._items.pop(index)
+            self._applied.pop(id(item), None)
+            self._clear_cache()
+            return item
         return None
 
+    def invalidate(self):
+        self._clear_cache()
+        super().invalidate()
+
+    def _clear_cache(self):
+        self._hints = None
+        self._layouts.clear()
+        self._minimum = None
+
     def expandingDirections(self):
         return Qt.Orientation(0)  
 
@@ -177,61 +325,98 @@ class FlowLayout(QLayout):
         return True
 
     def heightForWidth(self, width):
-        return self._do_layout(QRect(0, 0, width, 0), True)
+        return self._arrange(width)[0]
 
     def setGeometry(self, rect):
         super().setGeometry(rect)
-        self._do_layout(rect, False)
+        _, placements = self._arrange(rect.width())
+        rows = []
+        row_y = None
+        for item, geometry in placements:
+            geometry = geometry.translated(rect.x(), rect.y())
+            # Items that stay in place are not touched, e.g. on a height-only resize
+            if self._applied.get(id(item)) != geometry:
+                item.setGeometry(geometry)
+                self._applied[id(item)] = geometry
+            if geometry.y() != row_y:
+                rows.append([])
+                row_y = geometry.y()
+            rows[-1].append(item)
+        self._rows = rows
 
     def sizeHint(self):
         return self.minimumSize()
 
     def minimumSize(self):
-        size = QSize()
-        for item in self._items:
-            size = size.expandedTo(item.minimumSize())
-        return size
-
-    def _do_layout(self, rect, test_only):
-        x = rect.x()
-        y = rect.y()
-        line_height = 0
-        space_x = 10
-        space_y = 10
-        self._rows = []
-        current_row = []
-
-        for item in self._items:
-            next_x = x + item.sizeHint().width() + space_x
-            if next_x - space_x > rect.right() and line_height > 0:
-                self._rows.append(current_row)
-                current_row = []
-                x = rect.x()
-                y = y + line_height + space_y
-                next_x = x + item.sizeHint().width() + space_x
+        if self._minimum is None:
+            size = QSize()
+            for item in self._items:
+                size = size.expandedTo(item.minimumSize())
+            self._minimum = size
+        return self._minimum
+
+    def _arrange(self, width):
+        """Returns (height, [(item, QRect)]) for the width, computed once per width"""
+        cached = self._layouts.get(width)
+        if cached is not None:
+            return cached
+        if self._hints is None:
+            # Hidden widgets (e.g. dials still loading) take no space
+            self._hints = [(item, item.sizeHint()) for item in self._items
+                           if not item.isEmpty()]
+        right = width - 1
+        x = y = line_height = 0
+        placements = []
+        for item, hint in self._hints:
+            next_x = x + hint.width() + self.SPACING
+            if next_x - self.SPACING > right and line_height > 0:
+                x = 0
+                y += line_height + self.SPACING
+                next_x = hint.width() + self.SPACING
                 line_height = 0
+            placements.append((item, QRect(QPoint(x, y), hint)))
+            x = next_x
+            line_height = max(line_height, hint.height())
+        if len(self._layouts) >= self.MAX_CACHED_WIDTHS:
+            self._layouts.clear()
+        self._layouts[width] = (y + line_height, placements)
+        return self._layouts[width]
 
-            if not test_only:
-                item.setGeometry(QRect(QPoint(x, y), item.sizeHint()))
+class SensorWorker(QThread):
+    """Runs the dial scheduler, sensor reads and dial writes on a background thread"""
+    sensor_data_ready = pyqtSignal(dict)
 
-            x = next_x
-            line_height = max(line_height, item.sizeHint().height())
-            current_row.append(item)
+    def __init__(self, updater, parent=None):
+        super().__init__(parent)
+        self.updater = updater
 
-        if current_row:
-            self._rows.append(current_row)
+    def run(self):
+        self.updater.run(self.sensor_data_ready.emit)
 
-        return y + line_height
+    def stop(self):
+        """Stops the scheduler and waits for a running pass to finish"""
+        self.updater.stop()
+        self.wait()
 
 class VU1GUI(QMainWindow):
-    def __init__(self):
+    # Emitted from the I/O pool, delivered on the GUI thread
+    dial_status_loaded = pyqtSignal(str, object)
+    dial_image_loaded = pyqtSignal(str, object)
+    image_upload_finished = pyqtSignal(str, str)  # status message, error
+    command_finished = pyqtSignal(str, str)  # status message, error
+    command_succeeded = pyqtSignal(object)  # callback to run on the GUI thread
+
+    def __init__(self, base_path=None):
         super().__init__()
         
         # Connect to QApplication's aboutToQuit signal
         QApplication.instance().aboutToQuit.connect(self.shutdown_dials)
         
         # Get the correct base path whether running as script or exe
-        if getattr(sys, 'frozen', False):
+        if base_path:
+            # Another settings folder, e.g. for benchmarks
+            self.base_path = base_path
+        elif getattr(sys, 'frozen', False):
             # Running as exe
             self.base_path = os.path.dirname(sys.executable)
         else:
@@ -241,6 +426,9 @@ class VU1GUI(QMainWindow):
         # Load settings from JSON file with correct path
         self.settings_file = os.path.join(self.base_path, "settings.json")
         self.assignments_file = os.path.join(self.base_path, "assignments.json")
+        # Rapid edits are batched into one write on a background thread
+        self.settings_store = JsonStore(self.settings_file)
+        self.assignments_store = JsonStore(self.assignments_file)
         
         self.settings = self.load_settings()
         
@@ -252,6 +440,14 @@ class VU1GUI(QMainWindow):
         self.api_key = self.settings.get("api_key", "")  # Changed to empty string
         self.backlight_values = {}  # Initialize backlight_values
         
+        # Timings of sensor reads, API calls and ticks for the diagnostics
+        self.metrics = Metrics()
+        self.metrics_server = None
+        self.diagnostics_dialog = None
+        
+        # One pooled client per VU1 server, calls for a dial go to its server
+        self.client = pool_from_settings(self.settings, self.metrics)
+        
         # Basic window setup
         self.setWindowTitle("VU1 GUI")
         self.setMinimumSize(935, 600)
@@ -262,32 +458,82 @@ class VU1GUI(QMainWindow):
         if not self.server_address or not self.api_key:
             self._show_settings_dialog()
         
+        # Pool for dial details, images and other one-off API calls
+        self.io_executor = ThreadPoolExecutor(max_workers=self.settings.get("max_concurrency", 8),
+                                              thread_name_prefix="vu1-io")
+        self.dial_status_loaded.connect(self.on_dial_status_loaded)
+        self.dial_image_loaded.connect(self.on_dial_image_loaded)
+        self.image_upload_finished.connect(self.on_image_upload_finished)
+        self.command_finished.connect(self.on_command_finished)
+        self.command_succeeded.connect(lambda callback: callback())
+        self.image_cache = DialImageCache(os.path.join(self.base_path, "image_cache"),
+                                          self.settings.get("image_cache_entries", 64))
+        
         # Widgets and data
         self.dial_widgets = {}
+        self.pending_loads = 0
+        self.pending_shows = []  # dials whose status arrived, shown together
         self.sensor_assignments = {}
+        self.sensor_ids = {}  # dial_id -> pre-resolved sensor ID
+        self.expressions = {}  # dial_id -> expression over several sensors
         self.min_values = {}
         self.max_values = {}
+        self.update_intervals = {}  # dial_id -> refresh interval in ms
+        self.dial_filters = {}  # dial_id -> {"type": ..., "window": samples}
+        self.auto_ranges = {}  # dial_id -> {"percentile": 0-49} for learned ranges
+        self.learned_ranges = {}  # dial_id -> [min, max] learned so far
+        self.dial_servers = {}  # dial_id -> name of the server the dial was found on
         
         # GUI setup
         self.setup_ui()
         
-        # Initial fetch of AIDA64 data
-        self.statusBar().showMessage("Load AIDA64 Sensor data...")
-        self.aida64_data = self.fetch_aida64_data()  # Get initial sensor data
+        # Initial fetch of sensor data
+        # AIDA64 on Windows, Linux hwmon elsewhere unless settings.json says otherwise
+        self.statusBar().showMessage("Load sensor data...")
+        try:
+            self.sensor_source = sensor_source_from_settings(self.settings)
+        except Exception as e:
+            print(f"Error opening the sensor source: {e}")
+            QMessageBox.warning(self, "Error", 
+                              f"The sensor source could not be opened: {str(e)}")
+            self.sensor_source = create_sensor_source("hwmon")
+        sensor_data = read_snapshot(self.sensor_source, catalog=True)  # Get initial sensor data
+        
+        # One sorted sensor catalog shared by all sensor combo boxes
+        self.sensor_model = QStringListModel(self)
+        self.sensor_catalog = {}
+        self.refresh_sensor_catalog(sensor_data)
         
         # Load assignments from JSON file
         self.load_assignments()
         
-        # Timer for sensor updates
-        self.update_timer = QTimer()
-        self.update_timer.setInterval(1000)
-        self.update_timer.timeout.connect(self.schedule_sensor_updates)
+        # Sensor polling and dial writes run on a worker thread
+        change_filter = ChangeFilter(self.settings.get("deadband_abs", 0.0),
+                                     self.settings.get("deadband_pct", 0.0),
+                                     self.settings.get("refresh_interval", 30.0))
+        self.updater = DialUpdater(self.client, self.sensor_source, change_filter,
+                                   max_concurrency=self.settings.get("max_concurrency", 8),
+                                   tick_deadline=self.settings.get("tick_deadline", 0.9),
+                                   scheduler=DialScheduler(
+                                       self.settings.get("update_interval", 1000) / 1000),
+                                   metrics=self.metrics,
+                                   recorder=recorder_from_settings(self.settings, self.base_path),
+                                   probe_interval=self.settings.get("probe_interval", 5.0))
+        self.sync_updater()
+        self.client.add_recovery_listener(self.resync_backlights)
+        
+        # Optional local endpoint for Prometheus or scripts
+        if self.settings.get("metrics_port"):
+            try:
+                self.metrics_server = MetricsServer(self.metrics, self.settings["metrics_port"])
+            except Exception as e:
+                print(f"Error starting the metrics endpoint: {e}")
+        self.sensor_worker = SensorWorker(self.updater, self)
+        self.sensor_worker.sensor_data_ready.connect(self.on_sensor_data)
         
         # Fetch all dial details
         self.fetch_all_dial_details()
-        self.update_timer.start()
-        
-        self.statusBar().showMessage("Ready")
+        self.sensor_worker.start()
         
         # Tray Icon Setup
         self.tray_icon = QSystemTrayIcon(self)
@@ -326,16 +572,17 @@ class VU1GUI(QMainWindow):
     def save_settings(self):
         """Saves the current settings to the JSON file"""
         try:
-            settings = {
+            # Keep optional keys such as timeouts that have no dialog field
+            settings = dict(self.settings)
+            settings.update({
                 "server_address": self.server_address,
                 "api_key": self.api_key,
                 "minimize_to_tray": self.minimize_to_tray,
                 "start_in_tray": self.start_in_tray,  # Neue Option
                 "autostart": self.autostart_enabled
-            }
+            })
             
-            with open(self.settings_file, "w") as f:
-                json.dump(settings, f, indent=4)
+            self.settings_store.save(settings)
                 
         except Exception as e:
             print(f"Error saving settings: {e}")
@@ -349,8 +596,15 @@ class VU1GUI(QMainWindow):
         # Then save the settings and assignments
         self.save_settings()
         self.save_assignments()
+        self.flush_stores()
         event.accept()
 
+    def flush_stores(self):
+        """Writes pending settings and assignments now, e.g. before exiting"""
+        if not (self.settings_store.flush() and self.assignments_store.flush()):
+            QMessageBox.warning(self, "Error",
+                              "The settings or assignments could not be saved.")
+
     def setup_ui(self):
         # Main widget
         main_widget = QWidget()
@@ -369,10 +623,16 @@ class VU1GUI(QMainWindow):
         
         title = QLabel("VU1 GUI Prototype")
         title.setStyleSheet("font-size: 18px; font-weight: bold;")
+        all_images_btn = QPushButton("Set Image for All")
+        all_images_btn.clicked.connect(self.set_image_for_all_dials)
+        diagnostics_btn = QPushButton("Diagnostics")
+        diagnostics_btn.clicked.connect(self.show_diagnostics)
         settings_btn = QPushButton("Settings")
         settings_btn.clicked.connect(self._show_settings_dialog)
         header_layout.addWidget(title)
         header_layout.addStretch()  # Adds spacing between title and button
+        header_layout.addWidget(all_images_btn)
+        header_layout.addWidget(diagnostics_btn)
         header_layout.addWidget(settings_btn)
         main_layout.addWidget(header)
         
@@ -384,8 +644,10 @@ class VU1GUI(QMainWindow):
         
         # Status Bar
         self.statusBar().showMessage("Ready")
+        self.traffic_label = QLabel()
+        self.statusBar().addPermanentWidget(self.traffic_label)
 
-    def create_dial_widget(self, details, dial_id):
+    def create_dial_widget(self, details, dial_id, visible=True):
         """Create or update a dial widget"""
         try:
             # Remove existing widget if it exists
@@ -396,6 +658,8 @@ class VU1GUI(QMainWindow):
 
             # Create new widget
             widget = DialWidget(dial_id=dial_id)
+            widget.set_sensor_model(self.sensor_model)
+            widget.sensor_combo.popup_about_to_show.connect(self.on_sensor_popup)
             self.dial_widgets[dial_id] = widget
             
             # Signal connections
@@ -414,7 +678,13 @@ class VU1GUI(QMainWindow):
                                                  widget.sensor_combo.currentText()))
             widget.save_range_btn.clicked.connect(
                 lambda: self.set_value_range(dial_id, widget.min_value.value(),
-                                           widget.max_value.value()))
+                                           widget.max_value.value(),
+                                           widget.range_mode.currentData()))
+            widget.save_interval_btn.clicked.connect(
+                lambda: self.set_update_interval(dial_id, widget.interval_spin.value()))
+            widget.save_filter_btn.clicked.connect(
+                lambda: self.set_dial_filter(dial_id, widget.filter_combo.currentData(),
+                                             widget.filter_window.value()))
             widget.save_easing_btn.clicked.connect(
                 lambda: self.set_dial_easing(dial_id, 
                                            widget.period_spin.value(),
@@ -423,22 +693,17 @@ class VU1GUI(QMainWindow):
             # Update widget with data
             self.update_dial_widget_with_data(widget, details)
             
-            # Add widget to layout
+            # Add widget to layout, hidden ones are shown once their status arrives
+            if not visible:
+                widget.hide()
             self.dials_layout.addWidget(widget)
             
-            # Restore the stored backlight levels
+            # Restore the stored backlight levels, the dial itself is set by the loader
             if dial_id in self.backlight_values:
                 saved_backlight = self.backlight_values[dial_id]
                 widget.red_spin.setValue(saved_backlight["red"])
                 widget.green_spin.setValue(saved_backlight["green"])
                 widget.blue_spin.setValue(saved_backlight["blue"])
-                self.set_backlight(dial_id, 
-                                saved_backlight["red"],
-                                saved_backlight["green"],
-                                saved_backlight["blue"])
-            
-            # Customize window size
-            self.adjustSize()
             
         except Exception as e:
             print(f"Error creating widget for Dial {dial_id}: {e}")
@@ -451,6 +716,13 @@ class VU1GUI(QMainWindow):
             widget.green_spin.setValue(color.green())
             widget.blue_spin.setValue(color.blue())
 
+    def show_diagnostics(self):
+        """Opens the diagnostics window, or raises it if it is already open"""
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self.metrics, self, self.client)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
     def _show_settings_dialog(self):
         dialog = SettingsDialog(self)
         dialog.server_input.setText(self.server_address)
@@ -471,10 +743,13 @@ class VU1GUI(QMainWindow):
             
             # Check if server is available
             try:
-                test_url = f"{dialog.server_input.text().strip()}/api/v0/dial/list"
-                response = requests.get(test_url, params={"key": dialog.api_key_input.text()}, timeout=5)
-                response.raise_for_status()
-            except (requests.ConnectionError, requests.Timeout):
+                test_client = VU1Client(dialog.server_input.text().strip(),
+                                        dialog.api_key_input.text(), retries=0)
+                try:
+                    test_client.list_dials()
+                finally:
+                    test_client.close()
+            except UNREACHABLE_ERRORS:
                 QMessageBox.critical(self, "Fehler",
                                   f"The server at {dialog.server_input.text()} is unavailable!\n"
                                   "Please check the server address and your network connection.",
@@ -498,67 +773,80 @@ class VU1GUI(QMainWindow):
                 self.set_autostart(dialog.autostart.isChecked())
             
             self.save_settings()
-
-    def schedule_sensor_updates(self):
-        """Periodically updates the sensor data"""
-        self.aida64_data = self.fetch_aida64_data()
-        self.update_all_dials()
-
-    def update_all_dials(self):
-        """Update all dials with the latest sensor data"""
-        for dial_id in self.sensor_assignments:
-            self.update_dial_with_sensor_data(dial_id)
-
-    def update_dial_with_sensor_data(self, dial_id):
-        """Updates a single dial with sensor data"""
-        try:
-            sensor = self.sensor_assignments.get(dial_id)
-            if not sensor:
-                return
-
-            sensor_id = sensor.split('(')[-1].strip(')')
-            # Search in all categories for the sensor
-            sensor_data = None
-            for category in self.aida64_data.values():
-                if isinstance(category, list):
-                    found = next((item for item in category if item['id'] == sensor_id), None)
-                    if found:
-                        sensor_data = found
-                        break
-            
-            if sensor_data and 'value' in sensor_data:
-                value = float(sensor_data['value'])
-                min_value = self.min_values.get(dial_id, 0)
-                max_value = self.max_values.get(dial_id, 100)
-                mapped_value = self.map_value_to_range(value, min_value, max_value)
-                self.set_dial_value(dial_id, mapped_value)
-        except Exception as e:
-            print(f"Error updating Dial {dial_id}: {e}")
-
-    def fetch_aida64_data(self):
-        """Get the latest AIDA64 data"""
-        try:
-            return getData()
-        except Exception as e:
-            print(f"Error retrieving AIDA64 data: {e}")
-            return {}
-
-    def map_value_to_range(self, value, min_value, max_value):
-        """Maps a value to the range 0-100"""
-        try:
-            return max(0, min(100, ((value - min_value) / (max_value - min_value)) * 100))
-        except (ZeroDivisionError, TypeError):
-            return 0
-
-    def set_dial_value(self, dial_id, value):
-        """Set the value of a dial using the API"""
-        try:
-            url = f"{self.server_address}/api/v0/dial/{dial_id}/set"
-            params = {"key": self.api_key, "value": value}
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"Error setting the dial value {dial_id}: {e}")
+            if hasattr(self, "client"):
+                self.client.set_server(self.server_address, self.api_key)
+
+    def sync_updater(self):
+        """Hands the current assignments and ranges to the update loop"""
+        intervals = {dial_id: ms / 1000 for dial_id, ms in self.update_intervals.items()}
+        self.updater.set_assignments(self.sensor_ids, self.min_values, self.max_values,
+                                     intervals, self.dial_filters, self.expressions)
+        self.updater.set_auto_ranges(self.auto_ranges, self.learned_ranges,
+                                     self.settings.get("auto_range_window", 3600))
+
+    def on_sensor_data(self, data):
+        """Receives the latest sensor snapshot from the worker thread"""
+        # A selective source only delivers the assigned sensors, its catalog is
+        # read when a sensor list is opened instead
+        if not self.sensor_source.selective:
+            self.refresh_sensor_catalog(data)
+        stats = self.updater.change_filter.stats()
+        total = stats["sent"] + stats["suppressed"]
+        saved = stats["suppressed"] * 100 // total if total else 0
+        timing = self.updater.scheduler.stats()
+        self.traffic_label.setText(f"Writes sent: {stats['sent']}, "
+                                   f"suppressed: {stats['suppressed']} ({saved}% saved), "
+                                   f"late: {self.updater.overruns}, "
+                                   f"superseded: {self.updater.commands.dropped_stale} | "
+                                   f"jitter p95: {timing['jitter_p95_ms']:.1f} ms, "
+                                   f"missed: {timing['missed']}")
+        learned = self.updater.learned_ranges()
+        for dial_id, widget in self.dial_widgets.items():
+            if dial_id in learned:
+                widget.learned_label.setText("Learned: {:g} - {:g}".format(*learned[dial_id]))
+            elif dial_id in self.auto_ranges:
+                widget.learned_label.setText("Learning...")
+            else:
+                widget.learned_label.clear()
+
+    def stop_sensor_worker(self):
+        """Stops the worker thread and waits for a running pass to finish"""
+        if hasattr(self, "sensor_worker") and self.sensor_worker.isRunning():
+            self.sensor_worker.stop()
+            self.updater.close()
+            self.sensor_source.close()
+
+    def on_sensor_popup(self):
+        """Makes sure the sensor catalog is current before a list opens"""
+        if self.sensor_source.selective:
+            self.refresh_sensor_catalog(read_snapshot(self.sensor_source, catalog=True,
+                                                      metrics=self.metrics))
+        else:
+            # Passes only run while dials are due, so the last snapshot may be
+            # old. The worker reads again and on_sensor_data updates the list.
+            self.updater.request_read()
+
+    def refresh_sensor_catalog(self, sensor_data):
+        """Rebuilds the shared sensor model, but only if the set of sensor IDs changed"""
+        catalog = build_sensor_catalog(sensor_data)
+        if catalog.keys() == self.sensor_catalog.keys():
+            return
+        self.sensor_catalog = catalog
+        self.sensor_model.setStringList(sorted(catalog.values()))  # Sort the list alphabetically.
+        # Resetting the model clears the selection of every combo box
+        for widget in self.dial_widgets.values():
+            self.select_assigned_sensor(widget)
+
+    def select_assigned_sensor(self, widget):
+        """Selects the sensor assigned to a dial in its combo box"""
+        if widget.dial_id in self.expressions:
+            widget.sensor_combo.setCurrentIndex(-1)
+            widget.sensor_combo.setEditText("=" + self.expressions[widget.dial_id])
+            return
+        index = -1
+        if widget.dial_id in self.sensor_assignments:
+            index = widget.sensor_combo.findText(self.sensor_assignments[widget.dial_id])
+        widget.sensor_combo.setCurrentIndex(index)
 
     def load_assignments(self):
         """Loads the sensor assignments, value ranges and backlight settings"""
@@ -567,37 +855,55 @@ class VU1GUI(QMainWindow):
                 with open(self.assignments_file, "r") as file:
                     data = json.load(file)
                     self.sensor_assignments = data.get("sensor_assignments", {})
+                    self.sensor_ids = {dial_id: parse_sensor_id(text)
+                                       for dial_id, text in self.sensor_assignments.items()}
+                    self.expressions = data.get("expressions", {})
                     self.min_values = data.get("min_values", {})
                     self.max_values = data.get("max_values", {})
+                    self.update_intervals = data.get("update_intervals", {})
+                    self.dial_filters = data.get("filters", {})
+                    self.auto_ranges = data.get("auto_ranges", {})
+                    self.learned_ranges = data.get("learned_ranges", {})
                     self.backlight_values = data.get("backlight_values", {})
+                    self.dial_servers = data.get("dial_servers", {})
+                    self.client.set_dial_servers(self.dial_servers)
             self.statusBar().showMessage("Settings and assignments loaded")
         except Exception as e:
             print(f"Error loading assignments: {e}")
             self.sensor_assignments = {}
+            self.sensor_ids = {}
+            self.expressions = {}
             self.min_values = {}
             self.max_values = {}
+            self.update_intervals = {}
+            self.dial_filters = {}
+            self.auto_ranges = {}
+            self.learned_ranges = {}
             self.backlight_values = {}
             self.statusBar().showMessage("Error loading settings!")
 
     def save_assignments(self):
         """Saves the sensor assignments, value ranges and backlight settings"""
         try:
-            # Collect current backlight values
-            for dial_id, widget in self.dial_widgets.items():
-                self.backlight_values[dial_id] = {
-                    "red": widget.red_spin.value(),
-                    "green": widget.green_spin.value(),
-                    "blue": widget.blue_spin.value()
-                }
+            # Keep the learned bounds only for dials that are still in auto mode
+            if hasattr(self, "updater"):
+                self.learned_ranges.update(self.updater.learned_ranges())
+            self.learned_ranges = {dial_id: bounds for dial_id, bounds
+                                   in self.learned_ranges.items() if dial_id in self.auto_ranges}
             
             data = {
                 "sensor_assignments": self.sensor_assignments,
+                "expressions": self.expressions,
                 "min_values": self.min_values,
                 "max_values": self.max_values,
-                "backlight_values": self.backlight_values  # Add backlight values
+                "update_intervals": self.update_intervals,
+                "filters": self.dial_filters,
+                "auto_ranges": self.auto_ranges,
+                "learned_ranges": self.learned_ranges,
+                "backlight_values": self.backlight_values,  # Add backlight values
+                "dial_servers": self.dial_servers
             }
-            with open(self.assignments_file, "w") as file:
-                json.dump(data, file, indent=4)
+            self.assignments_store.save(data)
             self.statusBar().showMessage("Settings and assignments saved")
         except Exception as e:
             print(f"Error when saving assignments: {e}")
@@ -616,40 +922,21 @@ class VU1GUI(QMainWindow):
             # No longer get the backlight values from the API,
             # instead, they are loaded from assignments.json
 
-            # refresh this image
-            if "image" in details and details["image"]:
-                image = QImage.fromData(details["image"])
-                if not image.isNull():
-                    scaled_pixmap = QPixmap.fromImage(image).scaled(
-                        widget.image_label.size(),
-                        Qt.AspectRatioMode.KeepAspectRatio,
-                        Qt.TransformationMode.SmoothTransformation
-                    )
-                    widget.image_label.setPixmap(scaled_pixmap)
-
             # Set min/max values from local settings
             widget.min_value.setValue(int(float(self.min_values.get(widget.dial_id, 0))))
             widget.max_value.setValue(int(float(self.max_values.get(widget.dial_id, 100))))
-
-            # Update sensor combo box
-            if self.aida64_data:
-                widget.sensor_combo.clear()
-                sensor_options = []
-                # Search all categories for sensors
-                for category in self.aida64_data.values():
-                    if isinstance(category, list):
-                        for item in category:
-                            if 'label' in item and 'id' in item:
-                                sensor_options.append(f"{item['label']} ({item['id']})")
-                
-                widget.sensor_combo.addItems(sorted(sensor_options))  # Sort the list alphabetically.
-                
-                # Set selected sensor
-                if widget.dial_id in self.sensor_assignments:
-                    index = widget.sensor_combo.findText(
-                        self.sensor_assignments[widget.dial_id])
-                    if index >= 0:
-                        widget.sensor_combo.setCurrentIndex(index)
+            widget.interval_spin.setValue(int(self.update_intervals.get(
+                widget.dial_id, self.settings.get("update_interval", 1000))))
+            auto_range = self.auto_ranges.get(widget.dial_id)
+            widget.range_mode.setCurrentIndex(max(0, widget.range_mode.findData(
+                auto_range["percentile"] if auto_range else None)))
+            dial_filter = self.dial_filters.get(widget.dial_id, {})
+            widget.filter_combo.setCurrentIndex(max(0, widget.filter_combo.findData(
+                dial_filter.get("type", "none"))))
+            widget.filter_window.setValue(int(dial_filter.get("window", 5)))
+
+            # Set selected sensor, the combo box shares the sensor catalog model
+            self.select_assigned_sensor(widget)
 
             # Update easing parameters
             easing = status_data.get("easing", {})
@@ -663,37 +950,162 @@ class VU1GUI(QMainWindow):
     def fetch_all_dial_details(self):
         """Get the details of all available dials"""
         try:
-            url = f"{self.server_address}/api/v0/dial/list"
-            params = {"key": self.api_key}
+            self.statusBar().showMessage("Loading dials...")
+            self.load_started = time.monotonic()
+            self.first_dial_time = None
+            dials = self.client.list_dials()
+            if self.client.dial_servers != self.dial_servers:
+                # Lets the daemon reach every dial even before its first listing
+                self.dial_servers = dict(self.client.dial_servers)
+                self.save_assignments()
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            response_data = response.json()
-            
-            dials = response_data.get("data", [])
-            if not isinstance(dials, list):
-                raise ValueError(f"Invalid API response format: {response_data}")
-            
-            # Delete existing widgets
-            for widget in self.dial_widgets.values():
-                widget.deleteLater()
-            self.dial_widgets.clear()
+            # Lay out once after all widgets are replaced, not after each one
+            self.dials_layout.setEnabled(False)
+            try:
+                # Delete existing widgets
+                for widget in self.dial_widgets.values():
+                    self.dials_layout.removeWidget(widget)
+                    widget.deleteLater()
+                self.dial_widgets.clear()
+                
+                # Create hidden widgets in list order, they appear as their status arrives
+                for dial in dials:
+                    self.create_dial_widget({}, dial['uid'], visible=False)
+            finally:
+                self.dials_layout.setEnabled(True)
             
-            # Create new widgets for each dial
+            # Fetch all status documents and images concurrently
+            self.pending_loads = 2 * len(dials)
             for dial in dials:
-                details = self.fetch_dial_details(dial['uid'])
-                self.create_dial_widget(details, dial['uid'])
-                
-            # After creating all widgets, adjust the window size
-            self.adjustSize()
-            # Center the window on the screen
-            self.center_window()
+                self.io_executor.submit(self._load_dial_status, dial['uid'])
+                self.io_executor.submit(self._load_dial_image, dial['uid'])
+            if not dials:
+                self.finish_dial_loading()
                 
         except Exception as e:
             print(f"Error retrieving dial list: {e}")
             QMessageBox.warning(self, "Error", 
                               f"Error retrieving the dials: {str(e)}")
 
+    def _load_dial_status(self, dial_id):
+        """Runs on the I/O pool: fetches the status and restores the backlight"""
+        try:
+            status = self.client.get_status(dial_id)
+        except Exception as e:
+            print(f"Error retrieving status for Dial {dial_id}: {e}")
+            status = None
+        if dial_id in self.backlight_values:
+            saved_backlight = self.backlight_values[dial_id]
+            try:
+                self.client.set_backlight(dial_id, *self.backlight_percent(
+                    saved_backlight["red"], saved_backlight["green"], saved_backlight["blue"]))
+            except Exception as e:
+                print(f"Error restoring backlight for Dial {dial_id}: {e}")
+        self.dial_status_loaded.emit(dial_id, status)
+
+    def _load_dial_image(self, dial_id):
+        """Runs on the I/O pool: validates the cached image and emits its thumbnail"""
+        thumbnail = None
+        try:
+            entry = self.image_cache.get(dial_id) or {}
+            result = self.client.get_image_if_changed(dial_id, entry.get("etag"),
+                                                      entry.get("last_modified"))
+            if result is None:
+                # 304 Not Modified, the cached thumbnail is still current
+                thumbnail = self._cached_thumbnail(dial_id)
+            elif result[0]:
+                image_data, etag, last_modified = result
+                digest, changed = self.image_cache.put(dial_id, image_data, etag, last_modified)
+                if not changed:
+                    thumbnail = self._cached_thumbnail(dial_id)
+                if thumbnail is None:
+                    thumbnail = self._make_thumbnail(image_data,
+                                                     self.image_cache.thumbnail_path(dial_id, digest))
+        except Exception as e:
+            print(f"Error retrieving image for Dial {dial_id}: {e}")
+            # Show the last known image while the server is unreachable
+            thumbnail = self._cached_thumbnail(dial_id)
+        self.dial_image_loaded.emit(dial_id, thumbnail)
+
+    def _cached_thumbnail(self, dial_id):
+        """Loads the cached thumbnail of a dial, rebuilding it from the cached image if needed"""
+        path = self.image_cache.find_thumbnail(dial_id)
+        if path:
+            image = QImage(path)
+            if not image.isNull():
+                return image
+        entry = self.image_cache.get(dial_id)
+        image_data = self.image_cache.load_image(dial_id)
+        if entry and image_data:
+            return self._make_thumbnail(image_data,
+                                        self.image_cache.thumbnail_path(dial_id, entry["hash"]))
+        return None
+
+    def _make_thumbnail(self, image_data, path):
+        """Decodes and scales an image once and stores the thumbnail (QImage is thread-safe)"""
+        image = QImage.fromData(image_data)
+        if image.isNull():
+            return None
+        thumbnail = image.scaled(DIAL_IMAGE_SIZE,
+                                 Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+        thumbnail.save(path, "PNG")
+        return thumbnail
+
+    def on_dial_status_loaded(self, dial_id, status):
+        """Shows a dial as soon as its status has arrived"""
+        widget = self.dial_widgets.get(dial_id)
+        if widget:
+            self.update_dial_widget_with_data(widget, {"status": status or {}})
+            if not self.pending_shows:
+                # Dials that arrive in the same event loop pass share one layout
+                QTimer.singleShot(0, self.show_pending_dials)
+            self.pending_shows.append(widget)
+            if self.first_dial_time is None:
+                self.first_dial_time = time.monotonic() - self.load_started
+        self._dial_load_done()
+
+    def show_pending_dials(self):
+        """Shows the dials whose status has arrived with a single re-layout"""
+        widgets, self.pending_shows = self.pending_shows, []
+        self.dials_layout.setEnabled(False)
+        try:
+            for widget in widgets:
+                if self.dial_widgets.get(widget.dial_id) is widget:  # not replaced meanwhile
+                    widget.show()
+        finally:
+            self.dials_layout.setEnabled(True)
+        self.dials_layout.invalidate()
+
+    def on_dial_image_loaded(self, dial_id, image):
+        """Fills in a dial image once it has been downloaded"""
+        widget = self.dial_widgets.get(dial_id)
+        if widget and image is not None:
+            widget.image_label.setPixmap(QPixmap.fromImage(image))
+        self._dial_load_done()
+
+    def _dial_load_done(self):
+        # Reloads after an image upload are not part of the startup count
+        if self.pending_loads <= 0:
+            return
+        self.pending_loads -= 1
+        if self.pending_loads == 0:
+            self.finish_dial_loading()
+
+    def finish_dial_loading(self):
+        """Recomputes the layout once after all dials have been loaded"""
+        if self.pending_shows:
+            self.show_pending_dials()
+        self.adjustSize()
+        self.center_window()
+        total_time = time.monotonic() - self.load_started
+        if self.first_dial_time is None:
+            self.statusBar().showMessage(f"No dials loaded ({total_time:.2f} s)")
+        else:
+            self.statusBar().showMessage(
+                f"{len(self.dial_widgets)} dials loaded: first after {self.first_dial_time:.2f} s, "
+                f"all after {total_time:.2f} s")
+
     def center_window(self):
         """Centers the window on the screen"""
         screen = QApplication.primaryScreen().geometry()
@@ -702,42 +1114,16 @@ class VU1GUI(QMainWindow):
         y = (screen.height() - size.height()) // 2
         self.move(x, y)
 
-    def fetch_dial_details(self, dial_id):
-        """Get the details for a single call"""
-        details = {}
-        endpoints = {
-            "image": f"dial/{dial_id}/image/get",
-            "status": f"dial/{dial_id}/status"  # Range endpoint removed
-        }
-        
-        try:
-            for key, endpoint in endpoints.items():
-                url = f"{self.server_address}/api/v0/{endpoint}"
-                params = {"key": self.api_key}
-                
-                headers = {}
-                if key != "image":
-                    headers["Accept"] = "application/json"
-                
-                response = requests.get(url, params=params, headers=headers)
-                response.raise_for_status()
-                
-                if key == "image":
-                    if response.headers.get('Content-Type') == 'image/png':
-                        details[key] = response.content
-                    else:
-                        details[key] = None
-                else:
-                    details[key] = response.json()
-                    
-        except Exception as e:
-            print(f"Error retrieving details for Dial {dial_id}: {e}")
-            details[key] = None
-            
-        return details
-
     def set_image_for_dial(self, dial_id):
         """Sets a new image for a dial"""
+        self.set_image_for_dials([dial_id])
+
+    def set_image_for_all_dials(self):
+        """Sets the same image for every dial"""
+        self.set_image_for_dials(list(self.dial_widgets))
+
+    def set_image_for_dials(self, dial_ids):
+        """Lets the user pick an image and uploads it to the given dials"""
         try:
             file_path = QFileDialog.getOpenFileName(
                 self, 
@@ -754,75 +1140,136 @@ class VU1GUI(QMainWindow):
                                   "Please select a PNG or JPG file.")
                 return
             
-            url = f"{self.server_address}/api/v0/dial/{dial_id}/image/set"
-            params = {"key": self.api_key}
-            
-            with open(file_path, "rb") as image_file:
-                files = {"imgfile": image_file}
-                response = requests.post(url, params=params, files=files)
-                response.raise_for_status()
-            
-            # Update the widget with the new details
-            details = self.fetch_dial_details(dial_id)
-            self.update_dial_widget_with_data(self.dial_widgets[dial_id], details)
-            
-            # Add status message
-            self.statusBar().showMessage(f"New image for Dial {dial_id} set: {os.path.basename(file_path)}")
+            # Preprocessing and upload run on the I/O pool
+            self.statusBar().showMessage(f"Uploading {os.path.basename(file_path)}...")
+            self.io_executor.submit(self._upload_image, dial_ids, file_path)
             
         except Exception as e:
-            print(f"Error setting image for dial {dial_id}: {e}")
+            print(f"Error setting image for dials {dial_ids}: {e}")
             QMessageBox.warning(self, "Error", 
                               f"Error setting image: {str(e)}")
 
-    def set_dial_name(self, dial_id, new_name):
-        """Sets a new name for a dialog"""
+    def _upload_image(self, dial_ids, file_path):
+        """Runs on the I/O pool: prepares the image once and uploads it to each dial"""
         try:
-            url = f"{self.server_address}/api/v0/dial/{dial_id}/name"
-            params = {"key": self.api_key, "name": new_name}
+            original_size = os.path.getsize(file_path)
+            image_data = prepare_dial_image(file_path, mode=self.settings.get("image_mode", "1"))
+            file_name = os.path.splitext(os.path.basename(file_path))[0] + ".png"
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            # Aktualisiere das Widget
-            details = self.fetch_dial_details(dial_id)
-            self.update_dial_widget_with_data(self.dial_widgets[dial_id], details)
-            
-            # Statusmeldung hinzufügen
-            self.statusBar().showMessage(f"Name for dial {dial_id} has been set to '{new_name}'")
+            started = time.monotonic()
+            for dial_id in dial_ids:
+                self.client.set_image(dial_id, image_data, file_name)
+                # Drop the cached image and load the new one
+                self.image_cache.invalidate(dial_id)
+                self._load_dial_image(dial_id)
+            upload_time = time.monotonic() - started
             
+            saved = max(0, original_size - len(image_data))
+            target = f"Dial {dial_ids[0]}" if len(dial_ids) == 1 else f"{len(dial_ids)} dials"
+            self.image_upload_finished.emit(
+                f"New image for {target} set: {os.path.basename(file_path)} "
+                f"({original_size / 1024:.1f} KB -> {len(image_data) / 1024:.1f} KB, "
+                f"{saved / 1024:.1f} KB saved per dial, upload took {upload_time:.2f} s)", "")
         except Exception as e:
-            print(f"Error setting name for dial {dial_id}: {e}")
+            print(f"Error setting image for dials {dial_ids}: {e}")
+            self.image_upload_finished.emit("", str(e))
+
+    def on_image_upload_finished(self, message, error):
+        """Reports the result of an image upload"""
+        if error:
             QMessageBox.warning(self, "Error", 
-                              f"Error setting name: {str(e)}")
+                              f"Error setting image: {error}")
+        else:
+            self.statusBar().showMessage(message)
+
+    def send_command(self, dial_id, kind, call, message, error_text, on_success=None):
+        """Queues an API call for a dial ahead of the value updates, without blocking the UI
+
+        A newer command of the same kind replaces this one if it has not
+        started yet. The result is reported through command_finished, and
+        on_success is called on the GUI thread once the call went through.
+        """
+        def finished(future):
+            if future.cancelled() or (not future.exception() and future.result() is SUPERSEDED):
+                return
+            if isinstance(future.exception(), UNREACHABLE_ERRORS):
+                # No message box per click while the server is down, the last
+                # saved backlights are sent again once it is back
+                if not isinstance(future.exception(), ServerUnavailable):
+                    print(f"{error_text} for Dial {dial_id}: {future.exception()}")
+                self.command_finished.emit(f"{error_text}: the server is unreachable", "")
+            elif future.exception():
+                print(f"{error_text} for Dial {dial_id}: {future.exception()}")
+                self.command_finished.emit("", f"{error_text}: {future.exception()}")
+            else:
+                if on_success:
+                    self.command_succeeded.emit(on_success)
+                self.command_finished.emit(message, "")
+
+        try:
+            future = self.updater.commands.submit(dial_id, kind, call, priority=INTERACTIVE)
+            future.add_done_callback(finished)
+        except Exception as e:
+            print(f"{error_text} for Dial {dial_id}: {e}")
+            QMessageBox.warning(self, "Error", f"{error_text}: {str(e)}")
+
+    def resync_backlights(self, server):
+        """Runs when a server is reachable again: sends the saved backlights of its dials
+
+        The dial values are written by the update loop in the same pass.
+        """
+        for dial_id, levels in list(self.backlight_values.items()):
+            if self.client.client_for(dial_id).name != server:
+                continue
+            try:
+                self.updater.commands.submit(dial_id, "backlight", self.client.set_backlight,
+                                             dial_id, *self.backlight_percent(
+                                                 levels["red"], levels["green"], levels["blue"]))
+            except Exception as e:
+                print(f"Error restoring backlight for Dial {dial_id}: {e}")
+        self.command_finished.emit(f"Server {server} is reachable again, dials resynced", "")
+
+    def on_command_finished(self, message, error):
+        """Reports the result of a queued dial command"""
+        if error:
+            QMessageBox.warning(self, "Error", error)
+        else:
+            self.statusBar().showMessage(message)
+
+    def set_dial_name(self, dial_id, new_name):
+        """Sets a new name for a dialog"""
+        def rename():
+            self.client.set_name(dial_id, new_name)
+            # Aktualisiere das Widget, the image is unchanged and not fetched again
+            self.dial_status_loaded.emit(dial_id, self.client.get_status(dial_id))
+
+        self.send_command(dial_id, "name", rename,
+                          f"Name for dial {dial_id} has been set to '{new_name}'",
+                          "Error setting name")
+
+    @staticmethod
+    def backlight_percent(red, green, blue):
+        """Convert RGB (0-255) to percentage values (0-100)"""
+        return int((red / 255) * 100), int((green / 255) * 100), int((blue / 255) * 100)
 
     def set_backlight(self, dial_id, red, green, blue):
         """Sets the background color of a dialog"""
-        try:
-            # Convert RGB (0-255) to percentage values (0-100)
-            red_pct = int((red / 255) * 100)
-            green_pct = int((green / 255) * 100)
-            blue_pct = int((blue / 255) * 100)
-            
-            url = f"{self.server_address}/api/v0/dial/{dial_id}/backlight"
-            params = {
-                "key": self.api_key,
-                "red": red_pct,
-                "green": green_pct,
-                "blue": blue_pct
-            }
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
+        # Only a color the server accepted is saved, it is sent again on the next start
+        def saved():
             # Speichere die aktuellen Werte
             self.backlight_values[dial_id] = {
                 "red": red,
                 "green": green,
                 "blue": blue
             }
-            
-            # Statusmeldung hinzufügen
-            self.statusBar().showMessage(f"Backlight for dial {dial_id} set to RGB({red}, {green}, {blue})")
+            self.save_assignments()
+
+        try:
+            levels = self.backlight_percent(red, green, blue)
+            self.send_command(dial_id, "backlight",
+                              lambda: self.client.set_backlight(dial_id, *levels),
+                              f"Backlight for dial {dial_id} set to RGB({red}, {green}, {blue})",
+                              "Error setting background color", saved)
             
         except Exception as e:
             print(f"Error setting background color for Dial {dial_id}: {e}")
@@ -830,16 +1277,43 @@ class VU1GUI(QMainWindow):
                               f"Error setting background color: {str(e)}")
 
     def assign_sensor_to_dial(self, dial_id, sensor_text):
-        """Assign an AIDA64 sensor to a dial"""
+        """Assign a sensor to a dial"""
         try:
             if not sensor_text:
                 return
             
-            self.sensor_assignments[dial_id] = sensor_text
+            if sensor_text.startswith("="):
+                # An expression over several sensors, e.g. =max(TCC1, TCC2)
+                expression = sensor_text[1:].strip()
+                try:
+                    _, referenced = compile_expression(expression)
+                except ValueError as e:
+                    QMessageBox.warning(self, "Error", str(e))
+                    return
+                unknown = [sensor_id for sensor_id in referenced
+                           if sensor_id not in self.sensor_catalog]
+                if unknown:
+                    QMessageBox.warning(self, "Error",
+                                      f"Unknown sensors: {', '.join(unknown)}")
+                    return
+                self.expressions[dial_id] = expression
+                self.sensor_assignments.pop(dial_id, None)
+                self.sensor_ids.pop(dial_id, None)
+            else:
+                # The combo box is editable, only accept entries from the catalog
+                if self.sensor_catalog.get(parse_sensor_id(sensor_text)) != sensor_text:
+                    QMessageBox.warning(self, "Error", 
+                                      f"Unknown sensor: {sensor_text}")
+                    return
+                
+                self.sensor_assignments[dial_id] = sensor_text
+                self.sensor_ids[dial_id] = parse_sensor_id(sensor_text)
+                self.expressions.pop(dial_id, None)
             self.save_assignments()
+            self.sync_updater()
             
             # Aktualisiere sofort den Wert
-            self.update_dial_with_sensor_data(dial_id)
+            self.updater.request_update(dial_id)
             
             # Statusmeldung hinzufügen
             sensor_name = sensor_text.split(" (")[0]  # Extrahiere den lesbaren Namen
@@ -850,16 +1324,22 @@ class VU1GUI(QMainWindow):
             QMessageBox.warning(self, "Error", 
                               f"Error assigning sensor: {str(e)}")
 
-    def set_value_range(self, dial_id, min_value, max_value):
-        """Saves the value range for a dial"""
+    def set_value_range(self, dial_id, min_value, max_value, auto_percentile=None):
+        """Saves the value range for a dial, auto_percentile None keeps it manual"""
         try:
             # Convert to integer before saving
             self.min_values[dial_id] = int(min_value)
             self.max_values[dial_id] = int(max_value)
+            # The manual range stays as the fallback until enough values were learned
+            if auto_percentile is None:
+                self.auto_ranges.pop(dial_id, None)
+            else:
+                self.auto_ranges[dial_id] = {"percentile": auto_percentile}
             self.save_assignments()
+            self.sync_updater()
             
             # Update the value immediately
-            self.update_dial_with_sensor_data(dial_id)
+            self.updater.request_update(dial_id)
             
             # Add status message
             self.statusBar().showMessage(f"Value range for dialog {dial_id} set to {min_value} - {max_value}")
@@ -869,25 +1349,39 @@ class VU1GUI(QMainWindow):
             QMessageBox.warning(self, "Error", 
                               f"Error setting the value range: {str(e)}")
 
-    def set_dial_easing(self, dial_id, period, step):
-        """Sets the easing parameters of a dial"""
+    def set_update_interval(self, dial_id, interval):
+        """Saves how often a dial is refreshed, in milliseconds"""
         try:
-            url = f"{self.server_address}/api/v0/dial/{dial_id}/easing/dial"
-            params = {
-                "key": self.api_key,
-                "period": period,
-                "step": step
-            }
-            
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            self.statusBar().showMessage(f"Easing parameter for dialog {dial_id} updated")
-            
+            self.update_intervals[dial_id] = int(interval)
+            self.save_assignments()
+            self.sync_updater()
+            self.statusBar().showMessage(f"Refresh interval for dial {dial_id} set to {interval} ms")
         except Exception as e:
-            print(f"Error setting easing parameters for dial {dial_id}: {e}")
-            QMessageBox.warning(self, "Error", 
-                              f"Error setting the easing parameters: {str(e)}")
+            print(f"Error setting the refresh interval for dial {dial_id}: {e}")
+            QMessageBox.warning(self, "Error",
+                              f"Error setting the refresh interval: {str(e)}")
+
+    def set_dial_filter(self, dial_id, filter_type, window):
+        """Saves how the sensor values of a dial are smoothed"""
+        try:
+            if filter_type == "none":
+                self.dial_filters.pop(dial_id, None)
+            else:
+                self.dial_filters[dial_id] = {"type": filter_type, "window": int(window)}
+            self.save_assignments()
+            self.sync_updater()
+            self.statusBar().showMessage(f"Filter for dial {dial_id} set to {filter_type}")
+        except Exception as e:
+            print(f"Error setting the filter for dial {dial_id}: {e}")
+            QMessageBox.warning(self, "Error",
+                              f"Error setting the filter: {str(e)}")
+
+    def set_dial_easing(self, dial_id, period, step):
+        """Sets the easing parameters of a dial"""
+        self.send_command(dial_id, "easing",
+                          lambda: self.client.set_easing(dial_id, period, step),
+                          f"Easing parameter for dialog {dial_id} updated",
+                          "Error setting the easing parameters")
 
     def resizeEvent(self, event):
         """Override resizeEvent to enforce minimum size"""
@@ -928,6 +1422,7 @@ class VU1GUI(QMainWindow):
     def set_autostart(self, enable):
         """Activates or deactivates the autorun function"""
         try:
+            import winreg  # Windows only
             key_path = r"Software\Microsoft\Windows\CurrentVersion\Run"
             app_name = "VU1_DIALS_GUI"
             exe_path = sys.executable
@@ -943,7 +1438,7 @@ class VU1GUI(QMainWindow):
             try:
                 key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, 
                                    winreg.KEY_SET_VALUE | winreg.KEY_QUERY_VALUE)
-            except WindowsError:
+            except OSError:
                 key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, key_path)
 
             if enable:
@@ -951,7 +1446,7 @@ class VU1GUI(QMainWindow):
             else:
                 try:
                     winreg.DeleteValue(key, app_name)
-                except WindowsError:
+                except OSError:
                     pass
 
             winreg.CloseKey(key)
@@ -964,23 +1459,27 @@ class VU1GUI(QMainWindow):
 
     def shutdown_dials(self):
         """Set all dials to 0 and turn off the light."""
+        # Make sure no update tick overwrites the zeroed dials
+        self.stop_sensor_worker()
+        if self.auto_ranges:
+            # Start from the learned ranges next time
+            self.save_assignments()
+        # Quitting from the tray skips closeEvent, so write pending edits here too
+        self.settings_store.flush()
+        self.assignments_store.flush()
+        self.image_cache.flush()
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        if self.metrics_server:
+            self.metrics_server.close()
+            self.metrics_server = None
         try:
             for dial_id in self.dial_widgets.keys():
                 try:
                     # Set value to 0
-                    url = f"{self.server_address}/api/v0/dial/{dial_id}/set"
-                    params = {"key": self.api_key, "value": 0}
-                    requests.get(url, params=params, timeout=1)
+                    self.client.set_value(dial_id, 0, timeout=1)
                     
                     # Turn off backlight
-                    url = f"{self.server_address}/api/v0/dial/{dial_id}/backlight"
-                    params = {
-                        "key": self.api_key,
-                        "red": 0,
-                        "green": 0,
-                        "blue": 0
-                    }
-                    requests.get(url, params=params, timeout=1)
+                    self.client.set_backlight(dial_id, 0, 0, 0, timeout=1)
                 except requests.exceptions.Timeout:
                     continue  # Skip to next dial if timeout occurs
                 except Exception as e:
@@ -0,0 +1,483 @@
+"""Client for the VU1 server REST API"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+from vu1_metrics import Metrics
+
+# Seconds to wait for each endpoint before giving up
+DEFAULT_TIMEOUTS = {
+    "list": 5,
+    "status": 3,
+    "image_get": 5,
+    "image_set": 15,
+    "set": 2,
+    "backlight": 2,
+    "name": 3,
+    "easing": 3,
+}
+
+
+class ServerUnavailable(requests.ConnectionError):
+    """Raised without sending the request while the circuit breaker of a server is open"""
+
+
+# Errors that mean the server could not be reached or did not answer in time.
+# RetryError is what the retrying adapter raises after repeated 502/503/504.
+UNREACHABLE_ERRORS = (requests.ConnectionError, requests.Timeout,
+                      requests.exceptions.RetryError)
+
+
+class CircuitBreaker:
+    """Stops calling a server that keeps failing and lets a probe through now and then
+
+    Closed, every call goes through. After failure_threshold connection
+    failures or server errors in a row it opens and calls fail at once with
+    ServerUnavailable. Once the backoff has passed it is half-open and lets
+    a single call through as a probe: if that succeeds it closes, if not it
+    opens again for twice as long, up to max_backoff seconds. The recovery
+    listeners are called by the first success after the breaker opened or
+    after a lost connection, as even a short outage may have been a restart
+    that reset the dials.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=3, backoff=1.0, max_backoff=60.0):
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.state = self.CLOSED
+        self.failures = 0  # in a row
+        self.opened = 0  # times the breaker opened
+        self.delay = backoff
+        self.retry_at = 0.0
+        self.listeners = []  # called without arguments when the server is back
+        self._probing = False
+        self._lost = False  # a connection failed since the last success
+        self._lock = threading.Lock()
+
+    def before_call(self, server_name):
+        """Raises ServerUnavailable unless a call may be sent now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now >= self.retry_at:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            wait = max(0.0, self.retry_at - now)
+        raise ServerUnavailable(f"The server {server_name} is unreachable, "
+                                f"next attempt in {wait:.0f} s")
+
+    def record_success(self):
+        """Closes the breaker, returns True if the calls before this one failed"""
+        with self._lock:
+            recovered = self.state != self.CLOSED or self._lost
+            self.state = self.CLOSED
+            self._lost = False
+            self.failures = 0
+            self.delay = self.backoff
+            self._probing = False
+            listeners = list(self.listeners) if recovered else []
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"Error resyncing after the server came back: {e}")
+        return recovered
+
+    def record_failure(self, connection_lost=False):
+        """Counts a failed call, returns True if the breaker opened because of it"""
+        with self._lock:
+            self.failures += 1
+            self._lost = self._lost or connection_lost
+            if self.state == self.HALF_OPEN:
+                self.delay = min(self.delay * 2, self.max_backoff)
+            elif self.state == self.OPEN or self.failures < self.failure_threshold:
+                return False
+            self.state = self.OPEN
+            self._probing = False
+            self.opened += 1
+            self.retry_at = time.monotonic() + self.delay
+            return True
+
+
+class _Retry(Retry):
+    """Retry that sends a GET again on a dropped connection, but not after a read timed out
+
+    A pooled keep-alive connection the server closed, e.g. after a restart,
+    fails on the next read like a dropped answer would, and one more attempt
+    on a fresh connection is enough. A request that timed out may still be
+    carried out by the server, so it is not repeated.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None,
+                  _stacktrace=None):
+        if isinstance(error, ReadTimeoutError):
+            raise error
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class ServerHealth:
+    """Outcome of the requests to one server, updated by every API call"""
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_latency = 0.0  # seconds
+        self.last_request = 0.0  # monotonic time the last request ended
+        self._lock = threading.Lock()
+
+    @property
+    def ok(self):
+        return self.consecutive_failures == 0
+
+    def record(self, latency, error=None):
+        with self._lock:
+            self.requests += 1
+            self.last_latency = latency
+            self.last_request = time.monotonic()
+            if error is None:
+                self.consecutive_failures = 0
+            else:
+                self.failures += 1
+                self.consecutive_failures += 1
+                self.last_error = str(error)
+
+    def snapshot(self):
+        with self._lock:
+            return {"ok": self.ok, "requests": self.requests, "failures": self.failures,
+                    "consecutive_failures": self.consecutive_failures,
+                    "last_error": self.last_error,
+                    "last_latency_ms": 1000 * self.last_latency}
+
+
+class VU1Client:
+    """Talks to one VU1 server over a pooled keep-alive session
+
+    name identifies the server among several in a ServerPool and
+    max_concurrency is its budget of parallel dial writes, None leaves it to
+    the DialUpdater. All calls pass the circuit breaker of the client.
+    """
+
+    def __init__(self, server_address, api_key, timeouts=None, retries=2,
+                 backoff_factor=0.2, pool_size=10, metrics=None, name="default",
+                 max_concurrency=None, metrics_prefix="api.", breaker=None):
+        self.server_address = server_address.rstrip("/")
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.health = ServerHealth()
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or Metrics()
+        self.metrics_prefix = metrics_prefix
+        self.api_key = api_key
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+
+        # Failed connects, stale pooled connections and gateway errors of GETs
+        # are retried, a timed out read or an image upload is never sent twice
+        retry = _Retry(total=retries, read=1, backoff_factor=backoff_factor,
+                       status_forcelist=(502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def set_server(self, server_address, api_key):
+        """Points the client to another server, keeping the session"""
+        self.server_address = server_address.rstrip("/")
+        self.api_key = api_key
+
+    def close(self):
+        """Closes all pooled connections"""
+        self.session.close()
+
+    def client_for(self, dial_id):
+        """Returns the client that serves a dial, always this one (see ServerPool)"""
+        return self
+
+    def server_clients(self):
+        """Returns the clients of all servers, just this one (see ServerPool)"""
+        return [self]
+
+    def probe(self):
+        """Asks the server for its dial list, only to learn whether it still answers"""
+        self._request("GET", "status", "dial/list")
+
+    def add_recovery_listener(self, callback):
+        """Calls callback(server name) when the server answers again after its breaker opened"""
+        self.breaker.listeners.append(lambda: callback(self.name))
+
+    def _request(self, method, name, endpoint, params=None, timeout=None, **kwargs):
+        url = f"{self.server_address}/api/v0/{endpoint}"
+        params = dict(params or {})
+        params["key"] = self.api_key
+        # Fails at once while the server is known to be down
+        self.breaker.before_call(self.name)
+        started = time.perf_counter()
+        try:
+            with self.metrics.timed(self.metrics_prefix + name):
+                response = self.session.request(method, url, params=params,
+                                                timeout=timeout or self.timeouts[name], **kwargs)
+                response.raise_for_status()
+        except Exception as e:
+            self.health.record(time.perf_counter() - started, e)
+            if (isinstance(e, UNREACHABLE_ERRORS)
+                    or (isinstance(e, requests.HTTPError) and e.response.status_code >= 500)):
+                lost = isinstance(e, (requests.ConnectionError, requests.exceptions.RetryError))
+                if self.breaker.record_failure(lost):
+                    print(f"Server {self.name} is unreachable, calls are paused for "
+                          f"{self.breaker.delay:g} s: {e}")
+            else:
+                # The server answered, e.g. with an unknown dial
+                self._record_success()
+            raise
+        self.health.record(time.perf_counter() - started)
+        self._record_success()
+        return response
+
+    def _record_success(self):
+        if self.breaker.record_success():
+            print(f"Server {self.name} is reachable again")
+
+    def list_dials(self):
+        """Returns the list of dials known to the server"""
+        response_data = self._request("GET", "list", "dial/list").json()
+        dials = response_data.get("data", [])
+        if not isinstance(dials, list):
+            raise ValueError(f"Invalid API response format: {response_data}")
+        return dials
+
+    def get_status(self, dial_id):
+        """Returns the status document of a dial"""
+        return self._request("GET", "status", f"dial/{dial_id}/status",
+                             headers={"Accept": "application/json"}).json()
+
+    def get_image(self, dial_id):
+        """Returns the PNG bytes of the dial image, or None for other content"""
+        response = self._request("GET", "image_get", f"dial/{dial_id}/image/get")
+        if response.headers.get('Content-Type') == 'image/png':
+            return response.content
+        return None
+
+    def get_image_if_changed(self, dial_id, etag=None, last_modified=None):
+        """Fetches the dial image unless it still matches the given validators
+
+        Returns None if the server answered 304 Not Modified, otherwise a
+        tuple of (PNG bytes or None, etag, last_modified).
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = self._request("GET", "image_get", f"dial/{dial_id}/image/get",
+                                 headers=headers)
+        if response.status_code == 304:
+            return None
+        image = response.content if response.headers.get('Content-Type') == 'image/png' else None
+        return image, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+    def set_image(self, dial_id, image_data, file_name="image.png"):
+        """Uploads new PNG image bytes to a dial"""
+        self._request("POST", "image_set", f"dial/{dial_id}/image/set",
+                      files={"imgfile": (file_name, image_data, "image/png")})
+
+    def set_value(self, dial_id, value, timeout=None):
+        """Moves the needle of a dial to a value between 0 and 100"""
+        self._request("GET", "set", f"dial/{dial_id}/set",
+                      params={"value": value}, timeout=timeout)
+
+    def set_backlight(self, dial_id, red, green, blue, timeout=None):
+        """Sets the backlight of a dial, each channel in percent"""
+        self._request("GET", "backlight", f"dial/{dial_id}/backlight",
+                      params={"red": red, "green": green, "blue": blue},
+                      timeout=timeout)
+
+    def set_name(self, dial_id, name):
+        """Renames a dial"""
+        self._request("GET", "name", f"dial/{dial_id}/name", params={"name": name})
+
+    def set_easing(self, dial_id, period, step):
+        """Sets the needle easing parameters of a dial"""
+        self._request("GET", "easing", f"dial/{dial_id}/easing/dial",
+                      params={"period": period, "step": step})
+
+
+class ServerPool:
+    """Dials of several VU1 servers behind the interface of one VU1Client
+
+    Every server keeps its own VU1Client, so its own connection pool, health
+    state and write budget. list_dials() asks all servers at once and
+    remembers which server reported which dial, the calls for a dial are
+    then sent to that server. Dials not seen yet go to the first server.
+    """
+
+    def __init__(self, clients):
+        if not clients:
+            raise ValueError("A server pool needs at least one server")
+        self.clients = {}
+        for client in clients:
+            if client.name in self.clients:
+                raise ValueError(f"Duplicate server name: {client.name}")
+            self.clients[client.name] = client
+        self.primary = clients[0]
+        self.dial_servers = {}  # dial_id -> server name
+        self._lock = threading.Lock()
+        for client in clients:
+            self._register_metrics(client)
+
+    def _register_metrics(self, client):
+        name = "".join(char if char.isalnum() else "_" for char in client.name)
+        client.metrics.register_counter(f"server_{name}_requests_total",
+                                        lambda: client.health.requests,
+                                        f"Requests sent to the server {client.name}")
+        client.metrics.register_counter(f"server_{name}_failures_total",
+                                        lambda: client.health.failures,
+                                        f"Failed requests to the server {client.name}")
+        client.metrics.register_counter(f"server_{name}_breaker_opened_total",
+                                        lambda: client.breaker.opened,
+                                        f"Times calls to the server {client.name} were stopped")
+        client.metrics.register_gauge(f"server_{name}_up",
+                                      lambda: int(client.breaker.state == CircuitBreaker.CLOSED),
+                                      f"1 while the circuit breaker of {client.name} is closed")
+
+    @property
+    def server_address(self):
+        return self.primary.server_address
+
+    def set_server(self, server_address, api_key):
+        """Points the first server to another address, like VU1Client.set_server()"""
+        self.primary.set_server(server_address, api_key)
+
+    def set_dial_servers(self, dial_servers):
+        """Adds known dial locations, e.g. saved from an earlier list_dials()"""
+        with self._lock:
+            self.dial_servers.update({dial_id: server for dial_id, server in dial_servers.items()
+                                      if server in self.clients})
+
+    def client_for(self, dial_id):
+        """Returns the client of the server a dial belongs to"""
+        server = self.dial_servers.get(dial_id)
+        return self.clients[server] if server else self.primary
+
+    def server_clients(self):
+        """Returns the clients of all servers"""
+        return list(self.clients.values())
+
+    def health(self):
+        """Returns {server name: health snapshot with the circuit breaker state}"""
+        return {name: dict(client.health.snapshot(), state=client.breaker.state)
+                for name, client in self.clients.items()}
+
+    def add_recovery_listener(self, callback):
+        """Calls callback(server name) whenever one of the servers answers again"""
+        for client in self.clients.values():
+            client.add_recovery_listener(callback)
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+
+    def list_dials(self):
+        """Returns the dials of all servers, each with the name of its server under "server"
+
+        A server that does not answer is left out, only if none answers the
+        error of the first one is raised.
+        """
+        clients = list(self.clients.values())
+        if len(clients) == 1:
+            results = [self._list_server(clients[0])]
+        else:
+            # Ask all servers at once, so the slowest one sets the time taken
+            with ThreadPoolExecutor(max_workers=len(clients),
+                                    thread_name_prefix="vu1-list") as executor:
+                results = list(executor.map(self._list_server, clients))
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+        dials = []
+        located = {}
+        for client, result in zip(clients, results):
+            if isinstance(result, Exception):
+                print(f"Error retrieving the dials of server {client.name}: {result}")
+                continue
+            for dial in result:
+                dial["server"] = client.name
+                located[dial.get("uid")] = client.name
+                dials.append(dial)
+        with self._lock:
+            self.dial_servers.update(located)
+        return dials
+
+    def _list_server(self, client):
+        try:
+            return client.list_dials()
+        except Exception as e:
+            return e
+
+    def get_status(self, dial_id):
+        return self.client_for(dial_id).get_status(dial_id)
+
+    def get_image(self, dial_id):
+        return self.client_for(dial_id).get_image(dial_id)
+
+    def get_image_if_changed(self, dial_id, etag=None, last_modified=None):
+        return self.client_for(dial_id).get_image_if_changed(dial_id, etag, last_modified)
+
+    def set_image(self, dial_id, image_data, file_name="image.png"):
+        self.client_for(dial_id).set_image(dial_id, image_data, file_name)
+
+    def set_value(self, dial_id, value, timeout=None):
+        self.client_for(dial_id).set_value(dial_id, value, timeout)
+
+    def set_backlight(self, dial_id, red, green, blue, timeout=None):
+        self.client_for(dial_id).set_backlight(dial_id, red, green, blue, timeout)
+
+    def set_name(self, dial_id, name):
+        self.client_for(dial_id).set_name(dial_id, name)
+
+    def set_easing(self, dial_id, period, step):
+        self.client_for(dial_id).set_easing(dial_id, period, step)
+
+
+def pool_from_settings(settings, metrics=None):
+    """Creates the ServerPool for server_address and the extra servers in settings.json
+
+    Extra servers are listed under "servers" as {"name": ..., "server_address":
+    ..., "api_key": ..., "max_concurrency": ...}. Timeouts, retries and the
+    circuit breaker settings apply to all of them.
+    """
+    default_concurrency = settings.get("max_concurrency", 8)
+    servers = [{"name": "default",
+                "server_address": settings.get("server_address", "http://localhost:5340"),
+                "api_key": settings.get("api_key", "")}]
+    servers += settings.get("servers", [])
+    clients = []
+    for index, server in enumerate(servers):
+        name = server.get("name") or f"server{index}"
+        concurrency = server.get("max_concurrency", default_concurrency)
+        clients.append(VU1Client(server.get("server_address", ""), server.get("api_key", ""),
+                                 timeouts=settings.get("timeouts"),
+                                 retries=settings.get("retries", 2),
+                                 backoff_factor=settings.get("retry_backoff", 0.2),
+                                 pool_size=max(10, concurrency), metrics=metrics, name=name,
+                                 max_concurrency=concurrency,
+                                 metrics_prefix="api." if index == 0 else f"api.{name}.",
+                                 breaker=CircuitBreaker(
+                                     settings.get("breaker_failures", 3),
+                                     settings.get("breaker_backoff", 1.0),
+                                     settings.get("breaker_max_backoff", 60.0))))
+    return ServerPool(clients)
@@ -0,0 +1,177 @@
+"""Outbound API calls per dial, where the newest command of a kind replaces an older one
+
+Every dial has at most one call running. Further calls wait in one slot per
+kind ("value", "backlight", "easing", ...), and a new call replaces a waiting
+one of the same kind, so a slow server gets the latest value instead of a
+backlog of old ones. Interactive commands from the UI run before the periodic
+value updates of the update loop.
+"""
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+# Priorities, lower runs first
+INTERACTIVE = 0
+PERIODIC = 1
+
+# Result of a command that was replaced by a newer one before it ran
+SUPERSEDED = object()
+
+
+class _Command:
+    __slots__ = ("kind", "priority", "sequence", "call", "args", "future")
+
+    def __init__(self, kind, priority, sequence, call, args):
+        self.kind = kind
+        self.priority = priority
+        self.sequence = sequence
+        self.call = call
+        self.args = args
+        self.future = Future()
+
+
+class _Lane:
+    """The worker threads of one server and its dials that have a command ready"""
+
+    def __init__(self, lock):
+        self.ready = []  # heap of (priority, sequence, dial_id), may hold outdated entries
+        self.condition = threading.Condition(lock)
+        self.threads = []
+
+
+class DialCommandQueue:
+    """Runs the API calls of the dials on worker threads, per server and by priority
+
+    Each server gets its own workers, as many as the max_concurrency of its
+    client or the default given here, so a slow server only delays its own
+    dials.
+    """
+
+    def __init__(self, client, max_concurrency=8):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.submitted = 0
+        self.completed = 0
+        self.dropped_stale = 0  # commands replaced by a newer one before they started
+        self._lock = threading.Lock()
+        self._pending = {}  # dial_id -> {kind: _Command}
+        self._running = set()  # dials with a call in progress
+        self._lanes = {}  # server name -> _Lane
+        self._sequence = itertools.count()
+        self._closed = False
+
+    def submit(self, dial_id, kind, call, *args, priority=PERIODIC):
+        """Queues call(*args) for a dial and returns a Future of its result
+
+        The Future of a command that is replaced by a newer one of the same
+        kind resolves to SUPERSEDED without the call being made.
+        """
+        client = self.client.client_for(dial_id)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The command queue is closed")
+            lane = self._lane_for(client)
+            commands = self._pending.setdefault(dial_id, {})
+            replaced = commands.get(kind)
+            if replaced is not None:
+                # The replacement keeps the urgency of the command it drops
+                priority = min(priority, replaced.priority)
+                if not replaced.future.cancelled():
+                    self.dropped_stale += 1
+            command = _Command(kind, priority, next(self._sequence), call, args)
+            commands[kind] = command
+            self.submitted += 1
+            if dial_id not in self._running:
+                heapq.heappush(lane.ready, (priority, command.sequence, dial_id))
+                lane.condition.notify()
+        if replaced is not None and replaced.future.set_running_or_notify_cancel():
+            replaced.future.set_result(SUPERSEDED)
+        return command.future
+
+    def _lane_for(self, client):
+        lane = self._lanes.get(client.name)
+        if lane is None:
+            lane = self._lanes[client.name] = _Lane(self._lock)
+            for index in range(client.max_concurrency or self.max_concurrency):
+                thread = threading.Thread(target=self._work, args=(lane,), daemon=True,
+                                          name=f"vu1-dial-{client.name}-{index}")
+                thread.start()
+                lane.threads.append(thread)
+        return lane
+
+    def _next(self, lane):
+        # Called with the lock held, returns (dial_id, command) or None once closed
+        while not self._closed:
+            if not lane.ready:
+                lane.condition.wait()
+                continue
+            _, _, dial_id = heapq.heappop(lane.ready)
+            commands = self._pending.get(dial_id)
+            if dial_id in self._running or not commands:
+                continue  # outdated entry, the dial was queued again
+            command = min(commands.values(), key=lambda c: (c.priority, c.sequence))
+            del commands[command.kind]
+            if not commands:
+                del self._pending[dial_id]
+            self._running.add(dial_id)
+            return dial_id, command
+        return None
+
+    def _work(self, lane):
+        while True:
+            with self._lock:
+                job = self._next(lane)
+            if job is None:
+                return
+            dial_id, command = job
+            try:
+                # A command cancelled at the tick deadline is dropped here
+                if command.future.set_running_or_notify_cancel():
+                    try:
+                        result = command.call(*command.args)
+                    except Exception as e:
+                        command.future.set_exception(e)
+                    else:
+                        command.future.set_result(result)
+            finally:
+                with self._lock:
+                    self._running.discard(dial_id)
+                    self.completed += 1
+                    commands = self._pending.get(dial_id)
+                    if commands:
+                        first = min(commands.values(), key=lambda c: (c.priority, c.sequence))
+                        heapq.heappush(lane.ready, (first.priority, first.sequence, dial_id))
+                        lane.condition.notify()
+
+    def depth(self):
+        """Returns the number of commands waiting to start"""
+        with self._lock:
+            return sum(len(commands) for commands in self._pending.values())
+
+    def stats(self):
+        with self._lock:
+            return {"depth": sum(len(commands) for commands in self._pending.values()),
+                    "running": len(self._running), "submitted": self.submitted,
+                    "completed": self.completed, "dropped_stale": self.dropped_stale}
+
+    def close(self, wait=False):
+        """Drops the waiting commands and stops the workers
+
+        With wait the call returns once the running calls are finished.
+        """
+        with self._lock:
+            self._closed = True
+            pending = [command for commands in self._pending.values()
+                       for command in commands.values()]
+            self._pending.clear()
+            lanes = list(self._lanes.values())
+            for lane in lanes:
+                lane.condition.notify_all()
+        for command in pending:
+            command.future.cancel()
+        if wait:
+            for lane in lanes:
+                for thread in lane.threads:
+                    if thread is not threading.current_thread():
+                        thread.join()
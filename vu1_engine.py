@@ -0,0 +1,525 @@
+"""Sensor acquisition and dial dispatch loop, independent of the GUI"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from concurrent.futures import wait
+from vu1_client import ServerUnavailable
+from vu1_commands import DialCommandQueue
+from vu1_expressions import ExpressionSet
+from vu1_metrics import Metrics
+from vu1_sensors import build_sensor_index, read_snapshot
+
+
+# Sensor index key of the value computed from the expression of a dial
+EXPRESSION_PREFIX = "="
+
+
+def map_value_to_range(value, min_value, max_value):
+    """Maps a value to the range 0-100"""
+    try:
+        return max(0, min(100, ((value - min_value) / (max_value - min_value)) * 100))
+    except (ZeroDivisionError, TypeError):
+        return 0
+
+
+class ChangeFilter:
+    """Skips dial writes that would not visibly move the needle"""
+
+    def __init__(self, deadband_abs=0.0, deadband_pct=0.0, refresh_interval=30.0):
+        self.deadband_abs = deadband_abs
+        self.deadband_pct = deadband_pct
+        self.refresh_interval = refresh_interval
+        self.last_sent = {}  # dial_id -> (value, monotonic time)
+        self.sent = 0
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def should_send(self, dial_id, value):
+        """Checks a value against the deadband of the last value sent"""
+        last = self.last_sent.get(dial_id)
+        if last is None:
+            return True
+        last_value, last_time = last
+        threshold = max(self.deadband_abs, abs(last_value) * self.deadband_pct / 100)
+        if (abs(value - last_value) <= threshold
+                and time.monotonic() - last_time < self.refresh_interval):
+            with self._lock:
+                self.suppressed += 1
+            return False
+        return True
+
+    def mark_sent(self, dial_id, value):
+        """Remembers a value that reached the dial"""
+        with self._lock:
+            self.last_sent[dial_id] = (value, time.monotonic())
+            self.sent += 1
+
+    def forget(self, dial_id=None):
+        """Drops the cache for one dial or all dials so the next value is sent"""
+        with self._lock:
+            if dial_id is None:
+                self.last_sent.clear()
+            else:
+                self.last_sent.pop(dial_id, None)
+
+    def stats(self):
+        """Returns the number of writes sent and suppressed"""
+        return {"sent": self.sent, "suppressed": self.suppressed}
+
+
+class RangeLearner:
+    """Learns the value range of a sensor from a rolling window of samples
+
+    The window is kept sorted as samples come and go, so the bounds are read
+    without rescanning the history. percentile 0 uses the observed min/max,
+    e.g. 5 uses the 5th and 95th percentile and ignores rare spikes. A seed
+    range, such as the bounds learned before a restart, is merged in until
+    the window is full.
+    """
+
+    def __init__(self, window=3600, percentile=0.0, seed=None):
+        self.window = max(2, int(window))
+        self.percentile = max(0.0, min(49.0, float(percentile)))
+        self.seed = tuple(seed) if seed else None
+        self.samples = deque()
+        self.sorted = []
+
+    def add(self, value):
+        self.samples.append(value)
+        insort(self.sorted, value)
+        if len(self.samples) > self.window:
+            oldest = self.samples.popleft()
+            del self.sorted[bisect_left(self.sorted, oldest)]
+
+    def bounds(self):
+        """Returns (min, max) or None while the range is still unknown or empty"""
+        count = len(self.sorted)
+        if count:
+            offset = int(self.percentile / 100 * (count - 1))
+            low, high = self.sorted[offset], self.sorted[count - 1 - offset]
+            if self.seed and count < self.window:
+                low, high = min(low, self.seed[0]), max(high, self.seed[1])
+        elif self.seed:
+            low, high = self.seed
+        else:
+            return None
+        return (low, high) if high > low else None
+
+
+class DialScheduler:
+    """Keeps every dial on its own refresh grid against the monotonic clock
+
+    The next deadline of a dial is its previous deadline plus its interval,
+    not the time the last pass finished, so late passes do not add up to
+    drift. Dials that fall due within group_window seconds of each other
+    share one acquisition pass.
+    """
+
+    def __init__(self, default_interval=1.0, group_window=0.02):
+        self.default_interval = default_interval
+        self.group_window = group_window
+        self.intervals = {}  # dial_id -> seconds
+        self.next_due = {}  # dial_id -> monotonic deadline
+        self.passes = 0
+        self.missed = 0  # refresh slots skipped because a pass came too late
+        self.jitter = deque(maxlen=1000)  # lateness of recent deadlines in seconds
+        self._lock = threading.Lock()
+
+    def set_intervals(self, dial_ids, intervals):
+        """Sets the dials to schedule and their refresh intervals in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self.intervals = {dial_id: intervals.get(dial_id, self.default_interval)
+                              for dial_id in dial_ids}
+            # New dials are due right away, removed ones are forgotten
+            self.next_due = {dial_id: self.next_due.get(dial_id, now)
+                             for dial_id in self.intervals}
+
+    def make_due(self, dial_id):
+        """Schedules a dial for the next pass"""
+        with self._lock:
+            if dial_id in self.next_due:
+                self.next_due[dial_id] = min(self.next_due[dial_id], time.monotonic())
+
+    def next_deadline(self):
+        """Returns the monotonic time of the earliest deadline"""
+        with self._lock:
+            if not self.next_due:
+                return time.monotonic() + self.default_interval
+            return min(self.next_due.values())
+
+    def due(self, now):
+        """Returns the dials due at now and moves them to their next deadline"""
+        due = []
+        with self._lock:
+            for dial_id, deadline in self.next_due.items():
+                if deadline > now + self.group_window:
+                    continue
+                due.append(dial_id)
+                interval = self.intervals[dial_id]
+                self.jitter.append(max(0.0, now - deadline))
+                next_deadline = deadline + interval
+                if next_deadline <= now:
+                    # Skip the slots that already passed instead of bursting
+                    skipped = int((now - next_deadline) // interval) + 1
+                    self.missed += skipped
+                    next_deadline += skipped * interval
+                self.next_due[dial_id] = next_deadline
+            if due:
+                self.passes += 1
+        return due
+
+    def shortest_interval(self, dial_ids):
+        """Returns the smallest refresh interval among the given dials"""
+        with self._lock:
+            return min((self.intervals.get(dial_id, self.default_interval)
+                        for dial_id in dial_ids), default=self.default_interval)
+
+    def stats(self):
+        """Returns pass count, missed deadlines and jitter in milliseconds"""
+        with self._lock:
+            jitter = sorted(self.jitter)
+            passes, missed = self.passes, self.missed
+        if not jitter:
+            return {"passes": passes, "missed": missed,
+                    "jitter_avg_ms": 0.0, "jitter_p95_ms": 0.0, "jitter_max_ms": 0.0}
+        return {
+            "passes": passes,
+            "missed": missed,
+            "jitter_avg_ms": 1000 * sum(jitter) / len(jitter),
+            "jitter_p95_ms": 1000 * jitter[int(0.95 * (len(jitter) - 1))],
+            "jitter_max_ms": 1000 * jitter[-1],
+        }
+
+
+class DialUpdater:
+    """Reads the sensors and pushes the mapped values to the dials
+
+    client is a VU1Client or a ServerPool. The writes go through a
+    DialCommandQueue with max_concurrency threads per server (or the
+    max_concurrency of its client), so a slow server cannot take the threads
+    of the others, and a value that is still waiting when the next one is
+    computed is replaced by it.
+
+    While run() is active, a server that got no request for probe_interval
+    seconds is asked for its dial list, so a restart is noticed even while
+    the change filter holds back every write.
+    """
+
+    def __init__(self, client, source, change_filter=None, max_concurrency=8,
+                 tick_deadline=0.9, scheduler=None, metrics=None, recorder=None,
+                 probe_interval=5.0):
+        self.client = client
+        self.probe_interval = probe_interval  # seconds, 0 turns probing off
+        self._probing = set()  # names of the servers with a probe running
+        self.recorder = recorder  # SensorRecorder that logs every snapshot, or None
+        self.source = source
+        self.change_filter = change_filter or ChangeFilter()
+        self.tick_deadline = tick_deadline
+        self.scheduler = scheduler or DialScheduler()
+        self._wake = threading.Event()
+        self._running = False
+        self._forced = set()  # dials to update regardless of the deadband
+        self._read_requested = False  # a sensor read without dials, see request_read()
+        self.last_read = 0.0  # monotonic time of the last sensor read
+        # Shared with the UI, whose commands run before the value updates
+        self.commands = DialCommandQueue(client, max_concurrency)
+        self._lagging = set()  # servers whose writes missed the last tick deadline
+        self.overruns = 0  # writes that missed the tick deadline
+        self.sensor_data = {}
+        self.sensor_index = {}
+        self.filters = None  # DialFilters, created once a dial uses a filter
+        self.filtered_values = {}  # dial_id -> smoothed sensor value
+        self.expressions = ExpressionSet({})  # composite values of dials without a single sensor
+        self.range_learners = {}  # dial_id -> RangeLearner for dials in auto-range mode
+        self._lock = threading.Lock()
+        self._sensor_ids = {}
+        self._min_values = {}
+        self._max_values = {}
+        self.metrics = metrics or Metrics()
+        self._register_metrics()
+        client.add_recovery_listener(self.resync)
+
+    def _register_metrics(self):
+        filter_stats = self.change_filter.stats
+        self.metrics.register_counter("writes_sent_total", lambda: filter_stats()["sent"],
+                                      "Dial values sent to the server")
+        self.metrics.register_counter("writes_suppressed_total",
+                                      lambda: filter_stats()["suppressed"],
+                                      "Dial values not sent because they did not change enough")
+        self.metrics.register_counter("tick_overruns_total", lambda: self.overruns,
+                                      "Dial writes dropped because they missed the tick deadline")
+        self.metrics.register_counter("writes_superseded_total",
+                                      lambda: self.commands.dropped_stale,
+                                      "Queued dial commands replaced by a newer one before they ran")
+        self.metrics.register_gauge("command_queue_depth", self.commands.depth,
+                                    "Dial commands waiting to be sent")
+        self.metrics.register_counter("scheduler_passes_total",
+                                      lambda: self.scheduler.stats()["passes"],
+                                      "Update passes run by the scheduler")
+        self.metrics.register_counter("scheduler_missed_total",
+                                      lambda: self.scheduler.stats()["missed"],
+                                      "Refresh slots skipped because a pass came too late")
+
+    def set_assignments(self, sensor_ids, min_values, max_values, intervals=None,
+                        filters=None, expressions=None):
+        """Replaces the dial assignments with a copy of the given ones
+
+        intervals maps dial IDs to their refresh interval in seconds, filters
+        to a DialFilters configuration such as {"type": "ema", "window": 5}
+        and expressions to an expression over several sensors that replaces
+        the single sensor of a dial, e.g. "max(TCC1, TCC2)".
+        """
+        expression_set = ExpressionSet(expressions or {})
+        wanted_ids = set(sensor_ids.values()) | set(expression_set.sensor_ids)
+        # Expression results are added to the sensor index under their own key,
+        # so filters and auto-ranges treat them like any other sensor
+        sensor_ids = dict(sensor_ids)
+        sensor_ids.update({dial_id: EXPRESSION_PREFIX + dial_id
+                           for dial_id in expression_set.dial_ids})
+        filters = {dial_id: config for dial_id, config in (filters or {}).items()
+                   if config.get("type", "none") != "none"}
+        if filters and self.filters is None:
+            # NumPy is only loaded when a dial actually uses a filter
+            from vu1_filters import DialFilters
+            self.filters = DialFilters()
+        if self.filters is not None:
+            self.filters.configure(sensor_ids, filters)
+        with self._lock:
+            self._sensor_ids = sensor_ids
+            self._min_values = dict(min_values)
+            self._max_values = dict(max_values)
+            self.expressions = expression_set
+        self.source.set_wanted_ids(wanted_ids)
+        self.scheduler.set_intervals(sensor_ids, intervals or {})
+        self._wake.set()
+
+    def set_auto_ranges(self, auto_ranges, learned_ranges=None, window=3600):
+        """Sets which dials learn their value range instead of using min/max values
+
+        auto_ranges maps dial IDs to {"percentile": 0-49}, learned_ranges holds
+        the bounds saved by learned_ranges() to start from.
+        """
+        learned_ranges = learned_ranges or {}
+        with self._lock:
+            learners = {}
+            for dial_id, config in auto_ranges.items():
+                percentile = config.get("percentile", 0)
+                learner = self.range_learners.get(dial_id)
+                # Keep what was learned so far unless the mode changed
+                if learner is None or learner.percentile != percentile or learner.window != window:
+                    learner = RangeLearner(window, percentile, learned_ranges.get(dial_id))
+                learners[dial_id] = learner
+            self.range_learners = learners
+
+    def learned_ranges(self):
+        """Returns the current learned bounds as {dial_id: [min, max]} for saving"""
+        learned = {}
+        with self._lock:
+            for dial_id, learner in self.range_learners.items():
+                bounds = learner.bounds()
+                if bounds:
+                    learned[dial_id] = [round(bounds[0], 3), round(bounds[1], 3)]
+        return learned
+
+    def request_update(self, dial_id):
+        """Updates a dial in the next pass, e.g. after a new assignment"""
+        with self._lock:
+            self._forced.add(dial_id)
+        self.scheduler.make_due(dial_id)
+        self._wake.set()
+
+    def request_read(self, max_age=1.0):
+        """Reads the sensors on the update thread soon, unless the last read is recent
+
+        The snapshot goes to on_pass like that of a normal pass, e.g. to
+        refresh the sensor list of the UI while no dial is due.
+        """
+        if time.monotonic() - self.last_read < max_age:
+            return
+        self._read_requested = True
+        self._wake.set()
+
+    def resync(self, server):
+        """Writes every dial of a server in the next pass, e.g. once it is reachable again
+
+        The server may have restarted with its dials at 0, so the deadband
+        does not apply to these writes.
+        """
+        with self._lock:
+            dial_ids = [dial_id for dial_id in self._sensor_ids
+                        if self.client.client_for(dial_id).name == server]
+            self._forced.update(dial_ids)
+        for dial_id in dial_ids:
+            self.scheduler.make_due(dial_id)
+        self._wake.set()
+
+    def run(self, on_pass=None):
+        """Runs update passes whenever dials are due until stop() is called
+
+        on_pass is called with the sensor snapshot of every pass.
+        """
+        self._running = True
+        while self._running:
+            self._probe_idle_servers()
+            delay = self.scheduler.next_deadline() - time.monotonic()
+            if delay > 0 and self._read_requested:
+                self._read_requested = False
+                data = self.schedule_sensor_updates([])
+                if on_pass:
+                    on_pass(data)
+                continue
+            if delay > 0:
+                # Woken early by stop(), request_update(), request_read() or new assignments
+                self._wake.wait(min(delay, self.probe_interval or delay))
+                self._wake.clear()
+                continue
+            due = self.scheduler.due(time.monotonic())
+            if due:
+                self._read_requested = False
+                # Do not wait for slow writes past the next refresh of a fast dial
+                deadline = min(self.tick_deadline, self.scheduler.shortest_interval(due))
+                data = self.schedule_sensor_updates(due, deadline)
+                if on_pass:
+                    on_pass(data)
+
+    def _probe_idle_servers(self):
+        if not self.probe_interval:
+            return
+        now = time.monotonic()
+        for client in self.client.server_clients():
+            with self._lock:
+                if (client.name in self._probing
+                        or now - client.health.last_request < self.probe_interval):
+                    continue
+                self._probing.add(client.name)
+            # On its own thread, an unreachable server must not hold up the passes
+            threading.Thread(target=self._probe, args=(client,), daemon=True,
+                             name=f"vu1-probe-{client.name}").start()
+
+    def _probe(self, client):
+        try:
+            client.probe()
+        except Exception:
+            pass  # counted by the circuit breaker, which resyncs once the server is back
+        finally:
+            with self._lock:
+                self._probing.discard(client.name)
+
+    def stop(self):
+        """Ends run() after the current pass"""
+        self._running = False
+        self._wake.set()
+
+    def schedule_sensor_updates(self, dial_ids=None, deadline=None):
+        """Reads the sensors once and updates the given (or all assigned) dials"""
+        with self.metrics.timed("tick"):
+            self.sensor_data = read_snapshot(self.source, metrics=self.metrics)
+            self.last_read = time.monotonic()
+            # Index the snapshot once so every dial update is a single lookup
+            self.sensor_index = build_sensor_index(self.sensor_data)
+            if self.recorder and self.sensor_index:
+                try:
+                    self.recorder.record(time.time(), self.sensor_index)
+                except Exception as e:
+                    print(f"Error recording sensor data: {e}")
+            expressions = self.expressions
+            if expressions:
+                # All expressions in one call over the index of this pass
+                for dial_id, value in expressions.evaluate(self.sensor_index).items():
+                    self.sensor_index[EXPRESSION_PREFIX + dial_id] = value
+            if self.filters:
+                # Every filtered dial sees every sample, not only when it is due
+                self.filtered_values = self.filters.update(self.sensor_index)
+            self.update_all_dials(dial_ids, deadline)
+        return self.sensor_data
+
+    def close(self, wait=False):
+        """Stops the command queue, dropping writes that have not started yet
+
+        With wait the call returns once the running writes are finished.
+        """
+        self.commands.close(wait)
+        if self.recorder:
+            self.recorder.close()
+
+    def update_all_dials(self, dial_ids=None, deadline=None):
+        """Update all dials (or the given ones) with the latest sensor data"""
+        with self._lock:
+            if dial_ids is None:
+                dial_ids = list(self._sensor_ids)
+            forced = self._forced.intersection(dial_ids)
+            self._forced.difference_update(forced)
+        # The writes run concurrently, so a tick costs about one round trip
+        futures = {}
+        for dial_id in dial_ids:
+            future = self.update_dial_with_sensor_data(dial_id, dial_id in forced)
+            if future:
+                futures[future] = self.client.client_for(dial_id).name
+        with self._lock:
+            lagging = set(self._lagging)
+        # Writes to a server that missed the last deadline are not waited for,
+        # so a slow or dead server does not hold up the dials of the others
+        waited = [future for future, server in futures.items() if server not in lagging]
+        if waited:
+            _, not_done = wait(waited, timeout=deadline or self.tick_deadline)
+            for future in not_done:
+                future.cancel()
+            with self._lock:
+                self.overruns += len(not_done)
+                self._lagging.update(futures[future] for future in not_done)
+
+    def update_dial_with_sensor_data(self, dial_id, force=False):
+        """Updates a single dial with sensor data, returns the pending write or None"""
+        try:
+            with self._lock:
+                sensor_id = self._sensor_ids.get(dial_id)
+                min_value = self._min_values.get(dial_id, 0)
+                max_value = self._max_values.get(dial_id, 100)
+            if not sensor_id:
+                return
+
+            raw_value = self.filtered_values.get(dial_id) if self.filters else None
+            if raw_value is None:
+                raw_value = self.sensor_index.get(sensor_id)
+            if raw_value is not None:
+                raw_value = float(raw_value)
+                with self._lock:
+                    learner = self.range_learners.get(dial_id)
+                    if learner:
+                        learner.add(raw_value)
+                        # The manual range applies until two different values were seen
+                        min_value, max_value = learner.bounds() or (min_value, max_value)
+                mapped_value = map_value_to_range(raw_value, min_value, max_value)
+                if force or self.change_filter.should_send(dial_id, mapped_value):
+                    return self.submit_dial_value(dial_id, mapped_value)
+        except Exception as e:
+            print(f"Error updating Dial {dial_id}: {e}")
+        return None
+
+    def submit_dial_value(self, dial_id, value):
+        """Queues a dial write, replacing a value of the dial that has not been sent yet"""
+        server = self.client.client_for(dial_id).name
+        return self.commands.submit(dial_id, "value", self._write_dial_value,
+                                    server, dial_id, value)
+
+    def _write_dial_value(self, server, dial_id, value):
+        started = time.monotonic()
+        if self.set_dial_value(dial_id, value):
+            self.change_filter.mark_sent(dial_id, value)
+            if time.monotonic() - started < self.tick_deadline:
+                # The server keeps up again, wait for its writes from now on
+                with self._lock:
+                    self._lagging.discard(server)
+
+    def set_dial_value(self, dial_id, value):
+        """Set the value of a dial using the API"""
+        try:
+            self.client.set_value(dial_id, value)
+            return True
+        except ServerUnavailable:
+            return False  # reported once by the circuit breaker, not for every dial
+        except Exception as e:
+            print(f"Error setting the dial value {dial_id}: {e}")
+            return False
@@ -0,0 +1,211 @@
+"""Dial values computed from several sensors, e.g. max(TCC1, TCC2, TCC3, TCC4)
+
+An expression uses sensor IDs, numbers, + - * / and parentheses, and the
+functions in FUNCTIONS. Sensor IDs are written as they are (TCPU,
+HW.k10temp.temp1) or quoted if they contain other characters
+("HW.nvme-0.temp1"). All expressions of all dials are compiled once into a
+single function that is called with the sensor values once per update.
+"""
+import ast
+import math
+
+
+def _valid(values):
+    return [value for value in values if value == value]  # drops NaN
+
+
+def _max(*values):
+    values = _valid(values)
+    return max(values) if values else math.nan
+
+
+def _min(*values):
+    values = _valid(values)
+    return min(values) if values else math.nan
+
+
+def _sum(*values):
+    values = _valid(values)
+    return sum(values) if values else math.nan
+
+
+def _avg(*values):
+    values = _valid(values)
+    return sum(values) / len(values) if values else math.nan
+
+
+def _div(numerator, denominator):
+    return numerator / denominator if denominator else math.nan
+
+
+# Names usable as functions in expressions
+FUNCTIONS = {
+    "max": _max,
+    "min": _min,
+    "sum": _sum,
+    "avg": _avg,
+    "abs": abs,
+    "fahrenheit": lambda celsius: celsius * 9 / 5 + 32,
+    "kelvin": lambda celsius: celsius + 273.15,
+    "kb": lambda value: value / 1024,
+    "mb": lambda value: value / 1024 ** 2,
+    "gb": lambda value: value / 1024 ** 3,
+}
+# Functions that take a single value, the others take one or more
+_SINGLE_ARGUMENT = {"abs", "fahrenheit", "kelvin", "kb", "mb", "gb"}
+_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _dotted_name(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        raise ValueError("Only sensor IDs may contain dots")
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class _Rewriter(ast.NodeTransformer):
+    """Checks an expression and replaces sensor IDs with lookups into the value list"""
+
+    def __init__(self, sensor_positions):
+        self.sensor_positions = sensor_positions  # shared by all expressions
+
+    def _sensor(self, sensor_id, node):
+        position = self.sensor_positions.setdefault(sensor_id, len(self.sensor_positions))
+        return ast.copy_location(
+            ast.Subscript(value=ast.Name(id="_v", ctx=ast.Load()),
+                          slice=ast.Constant(position), ctx=ast.Load()), node)
+
+    def generic_visit(self, node):
+        raise ValueError(f"Not allowed in an expression: {type(node).__name__}")
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _OPERATORS):
+            raise ValueError(f"Operator not allowed: {type(node.op).__name__}")
+        left, right = self.visit(node.left), self.visit(node.right)
+        if isinstance(node.op, ast.Div):
+            # Division by zero gives NaN instead of failing all dials
+            return ast.copy_location(ast.Call(func=ast.Name(id="_div", ctx=ast.Load()),
+                                              args=[left, right], keywords=[]), node)
+        node.left, node.right = left, right
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, (ast.USub, ast.UAdd)):
+            raise ValueError(f"Operator not allowed: {type(node.op).__name__}")
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise ValueError(f"Unknown function, use one of: {', '.join(FUNCTIONS)}")
+        if node.func.id in _SINGLE_ARGUMENT:
+            if node.keywords or len(node.args) != 1:
+                raise ValueError(f"{node.func.id}() takes exactly one value")
+        elif node.keywords or not node.args:
+            raise ValueError(f"{node.func.id}() takes one or more values")
+        node.args = [self.visit(arg) for arg in node.args]
+        node.func = ast.Name(id=f"_f_{node.func.id}", ctx=ast.Load())
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, str):
+            return self._sensor(node.value, node)
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"Not a number: {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        return self._sensor(node.id, node)
+
+    def visit_Attribute(self, node):
+        return self._sensor(_dotted_name(node), node)
+
+
+def _globals():
+    names = {f"_f_{name}": function for name, function in FUNCTIONS.items()}
+    names.update({"_div": _div, "__builtins__": {}})
+    return names
+
+
+def compile_expression(text):
+    """Compiles one expression, returns (function of a value list, sensor IDs)
+
+    Raises ValueError with a readable message if the expression is invalid.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}") from None
+    positions = {}
+    tree = _Rewriter(positions).visit(tree)
+    function = _lambda([tree.body])
+    return (lambda values: function(values)[0]), list(positions)
+
+
+def _lambda(bodies):
+    tree = ast.Expression(ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(arg="_v")], kwonlyargs=[],
+                           kw_defaults=[], defaults=[]),
+        body=ast.Tuple(elts=bodies, ctx=ast.Load())))
+    return eval(compile(ast.fix_missing_locations(tree), "<expressions>", "eval"), _globals())
+
+
+class ExpressionSet:
+    """The expressions of all dials, evaluated together in one call per update"""
+
+    def __init__(self, expressions):
+        self.sensor_positions = {}
+        self.dial_ids = []
+        self.errors = {}  # dial_id -> message for expressions that did not compile
+        bodies = []
+        for dial_id, text in expressions.items():
+            positions = dict(self.sensor_positions)
+            try:
+                tree = _Rewriter(positions).visit(ast.parse(text.strip(), mode="eval"))
+            except (SyntaxError, ValueError) as e:
+                self.errors[dial_id] = getattr(e, "msg", None) or str(e)
+                print(f"Error in the expression of Dial {dial_id}: {self.errors[dial_id]}")
+                continue
+            self.sensor_positions = positions
+            self.dial_ids.append(dial_id)
+            bodies.append(tree.body)
+        self.sensor_ids = list(self.sensor_positions)
+        self._function = _lambda(bodies) if bodies else None
+        # One function per dial, used if the combined call fails
+        self._single_functions = [_lambda([body]) for body in bodies]
+
+    def __bool__(self):
+        return bool(self.dial_ids)
+
+    def evaluate(self, sensor_index):
+        """Returns {dial_id: value} for all dials whose sensors are available"""
+        if not self._function:
+            return {}
+        values = [_to_float(sensor_index.get(sensor_id)) for sensor_id in self.sensor_ids]
+        try:
+            results = self._function(values)
+        except (ArithmeticError, ValueError, TypeError):
+            # e.g. an overflow in one dial, evaluate the others on their own
+            results = []
+            for function in self._single_functions:
+                try:
+                    results.append(function(values)[0])
+                except (ArithmeticError, ValueError, TypeError):
+                    results.append(math.nan)
+        return {dial_id: result for dial_id, result in zip(self.dial_ids, results)
+                if result == result}
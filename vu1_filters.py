@@ -0,0 +1,117 @@
+"""Per-dial smoothing of sensor values over a fixed-size NumPy history"""
+import threading
+import warnings
+
+import numpy as np
+
+FILTER_TYPES = ("none", "ema", "median", "peak")
+
+# Upper bound of the history per sensor, the memory use does not grow with uptime
+MAX_WINDOW = 120
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class DialFilters:
+    """Keeps a ring buffer of recent values per sensor and filters them for each dial
+
+    filters maps dial IDs to {"type": "ema" | "median" | "peak", "window": samples}.
+    "ema" is an exponential moving average with the span of the window,
+    "median" the rolling median and "peak" the maximum of the last window
+    samples. All dials are filtered together in one vectorized pass per update.
+    """
+
+    def __init__(self, capacity=MAX_WINDOW):
+        self.capacity = capacity
+        self.rows = {}  # sensor ID -> row in history
+        self.history = np.full((0, capacity), np.nan)
+        self.position = 0  # column the next sample is written to
+        self.samples = 0  # columns filled so far, at most capacity
+        self.dial_ids = []
+        self.dial_rows = np.zeros(0, dtype=np.intp)
+        self.types = np.zeros(0, dtype=object)
+        self.windows = np.zeros(0, dtype=np.intp)
+        self.ema = np.zeros(0)
+        self.ema_mask = np.zeros(0, dtype=bool)
+        self.ema_alpha = np.zeros(0)
+        self.groups = []  # (dial positions, history rows, window, reduction)
+        self._lock = threading.Lock()
+
+    def configure(self, sensor_ids, filters):
+        """Sets the filtered dials, keeping the history of sensors that stay assigned"""
+        dial_ids = [dial_id for dial_id, config in filters.items()
+                    if config.get("type", "none") in FILTER_TYPES[1:]
+                    and sensor_ids.get(dial_id)]
+        sensors = sorted({sensor_ids[dial_id] for dial_id in dial_ids})
+        with self._lock:
+            history = np.full((len(sensors), self.capacity), np.nan)
+            for row, sensor_id in enumerate(sensors):
+                if sensor_id in self.rows:
+                    history[row] = self.history[self.rows[sensor_id]]
+            old_ema = dict(zip(self.dial_ids, self.ema))
+            self.rows = {sensor_id: row for row, sensor_id in enumerate(sensors)}
+            self.history = history
+            self.dial_ids = dial_ids
+            self.dial_rows = np.array([self.rows[sensor_ids[dial_id]] for dial_id in dial_ids],
+                                      dtype=np.intp)
+            self.types = np.array([filters[dial_id]["type"] for dial_id in dial_ids], dtype=object)
+            self.windows = np.array([max(1, min(self.capacity, int(filters[dial_id].get("window", 5))))
+                                     for dial_id in dial_ids], dtype=np.intp)
+            self.ema = np.array([old_ema.get(dial_id, np.nan) for dial_id in dial_ids])
+            # Group the windowed dials once, so an update does one reduction per group
+            self.ema_mask = self.types == "ema"
+            self.ema_alpha = 2.0 / (self.windows[self.ema_mask] + 1)
+            self.groups = []
+            for kind, reduce in (("median", np.median), ("peak", np.max)):
+                for window in np.unique(self.windows[self.types == kind]):
+                    selected = np.flatnonzero((self.types == kind) & (self.windows == window))
+                    self.groups.append((selected, self.dial_rows[selected], int(window), reduce))
+
+    def __bool__(self):
+        return bool(self.dial_ids)
+
+    def update(self, sensor_index):
+        """Appends the current sensor values and returns {dial_id: filtered value}"""
+        with self._lock:
+            if not self.dial_ids:
+                return {}
+            values = np.array([_to_float(sensor_index.get(sensor_id)) for sensor_id in self.rows])
+            self.history[:, self.position] = values
+            self.position = (self.position + 1) % self.capacity
+            self.samples = min(self.samples + 1, self.capacity)
+
+            result = np.full(len(self.dial_ids), np.nan)
+            if self.ema_mask.any():
+                sample = values[self.dial_rows[self.ema_mask]]
+                state = self.ema[self.ema_mask]
+                state = np.where(np.isnan(state), sample,
+                                 np.where(np.isnan(sample), state,
+                                          state + self.ema_alpha * (sample - state)))
+                self.ema[self.ema_mask] = state
+                result[self.ema_mask] = state
+
+            for selected, rows, window, reduce in self.groups:
+                count = min(window, self.samples)
+                start = self.position - count
+                if start >= 0:
+                    block = self.history[rows, start:self.position]
+                else:
+                    # The window wraps around the end of the ring buffer
+                    block = np.concatenate((self.history[rows, start:],
+                                            self.history[rows, :self.position]), axis=1)
+                if np.isnan(block).any():
+                    # Only missing sensor values need the slower NaN aware reductions
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows
+                        reduce = np.nanmedian if reduce is np.median else np.nanmax
+                        result[selected] = reduce(block, axis=1)
+                else:
+                    result[selected] = reduce(block, axis=1)
+
+            return {dial_id: float(value) for dial_id, value in zip(self.dial_ids, result.tolist())
+                    if value == value}
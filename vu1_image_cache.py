@@ -0,0 +1,133 @@
+"""On-disk cache for dial images and their pre-scaled thumbnails"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class DialImageCache:
+    """Stores dial images keyed by dial UID and content hash, evicting the least recently used
+
+    Cache hits only update last_used in memory. The index is written by
+    put(), invalidate() and flush(), which the application calls on exit.
+    """
+
+    def __init__(self, directory, max_entries=64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.index_file = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self._dirty = False  # last_used changed since the index was written
+        os.makedirs(directory, exist_ok=True)
+        self.entries = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Error loading image cache index: {e}")
+            return {}
+
+    def _save_index(self):
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, "w") as file:
+            json.dump(self.entries, file)
+        os.replace(temp_file, self.index_file)
+        self._dirty = False
+
+    def flush(self):
+        """Writes the index if cache hits changed it since the last write"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self._save_index()
+            except Exception as e:
+                print(f"Error saving image cache index: {e}")
+
+    def _path(self, dial_id, digest, suffix):
+        safe_id = "".join(c for c in str(dial_id) if c.isalnum() or c in "-_")
+        return os.path.join(self.directory, f"{safe_id}-{digest}{suffix}")
+
+    def _remove_files(self, dial_id, entry):
+        for suffix in (".png", ".thumb.png"):
+            try:
+                os.remove(self._path(dial_id, entry["hash"], suffix))
+            except FileNotFoundError:
+                pass
+
+    def get(self, dial_id):
+        """Returns the cache entry of a dial (hash, etag, last_modified) or None"""
+        with self._lock:
+            entry = self.entries.get(dial_id)
+            return dict(entry) if entry else None
+
+    def find_thumbnail(self, dial_id):
+        """Returns the path of the cached thumbnail, or None if there is none"""
+        with self._lock:
+            entry = self.entries.get(dial_id)
+            if not entry:
+                return None
+            path = self._path(dial_id, entry["hash"], ".thumb.png")
+            if not os.path.exists(path):
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            return path
+
+    def load_image(self, dial_id):
+        """Returns the cached image bytes of a dial, or None"""
+        with self._lock:
+            entry = self.entries.get(dial_id)
+            if not entry:
+                return None
+            try:
+                with open(self._path(dial_id, entry["hash"], ".png"), "rb") as file:
+                    data = file.read()
+            except FileNotFoundError:
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            return data
+
+    def put(self, dial_id, image_data, etag=None, last_modified=None):
+        """Stores new image bytes and returns (digest, changed)"""
+        digest = hashlib.sha1(image_data).hexdigest()
+        with self._lock:
+            old_entry = self.entries.get(dial_id)
+            changed = not old_entry or old_entry["hash"] != digest
+            if changed:
+                if old_entry:
+                    self._remove_files(dial_id, old_entry)
+                with open(self._path(dial_id, digest, ".png"), "wb") as file:
+                    file.write(image_data)
+            self.entries[dial_id] = {
+                "hash": digest,
+                "etag": etag,
+                "last_modified": last_modified,
+                "last_used": time.time(),
+            }
+            self._evict()
+            self._save_index()
+        return digest, changed
+
+    def thumbnail_path(self, dial_id, digest):
+        """Returns where the thumbnail for an image hash is to be stored"""
+        return self._path(dial_id, digest, ".thumb.png")
+
+    def invalidate(self, dial_id):
+        """Forgets the cached image of a dial, e.g. after uploading a new one"""
+        with self._lock:
+            entry = self.entries.pop(dial_id, None)
+            if entry:
+                self._remove_files(dial_id, entry)
+                self._save_index()
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            dial_id = min(self.entries, key=lambda key: self.entries[key]["last_used"])
+            self._remove_files(dial_id, self.entries.pop(dial_id))
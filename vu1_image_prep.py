@@ -0,0 +1,27 @@
+"""Prepares images for the e-paper display of a VU1 dial before they are uploaded"""
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Native resolution of the VU1 e-paper display
+DISPLAY_SIZE = (200, 144)
+
+
+def prepare_dial_image(source, size=DISPLAY_SIZE, mode="1"):
+    """Crops and scales an image to the display and returns optimized PNG bytes
+
+    source is a path or file object. mode "1" dithers to black and white like
+    the e-paper panel shows it, "L" keeps greyscale.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        # Transparent areas become white paper instead of black
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGBA", image.size, "white")
+            image = Image.alpha_composite(background, image)
+        image = ImageOps.fit(image.convert("L"), size, Image.Resampling.LANCZOS)
+        if mode == "1":
+            image = image.convert("1")
+        buffer = BytesIO()
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
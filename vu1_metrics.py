@@ -0,0 +1,179 @@
+"""Latency histograms and counters for the update loop, with a local HTTP endpoint"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds of the latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Counts observations per latency bucket, plus errors and the maximum"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, error=False):
+        index = 0
+        while index < len(self.buckets) and seconds > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+
+    def quantile(self, share):
+        """Estimates a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = share * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets + (self.max,), self.counts):
+            if count and seen + count >= rank:
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.quantile(0.5),
+            "p95_ms": 1000 * self.quantile(0.95),
+            "max_ms": 1000 * self.max,
+        }
+
+
+class Metrics:
+    """Collects timings of named operations and counters read from other objects
+
+    Timings are histograms keyed by name, e.g. "api.set" or "tick".
+    Counters are callables registered once and read when a snapshot is taken,
+    so the hot path never has to update them twice.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}  # name -> (callable, help text, Prometheus type)
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, error=False):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds, error)
+
+    @contextmanager
+    def timed(self, name):
+        """Times the block and counts it as an error if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - started, error=True)
+            raise
+        self.observe(name, time.perf_counter() - started)
+
+    def register_counter(self, name, read, help_text=""):
+        """Adds a counter whose current value is returned by read()"""
+        self.counters[name] = (read, help_text, "counter")
+
+    def register_gauge(self, name, read, help_text=""):
+        """Adds a value that can go up and down, e.g. a queue length"""
+        self.counters[name] = (read, help_text, "gauge")
+
+    def snapshot(self):
+        """Returns all timings and counters as plain dicts"""
+        with self._lock:
+            timings = {name: histogram.summary()
+                       for name, histogram in sorted(self.histograms.items())}
+        counters = {}
+        for name, (read, _, _) in sorted(self.counters.items()):
+            try:
+                counters[name] = read()
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+        return {"uptime_s": time.time() - self.started, "timings": timings,
+                "counters": counters}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format"""
+        lines = ["# HELP vu1_operation_seconds Duration of sensor reads, API calls and ticks",
+                 "# TYPE vu1_operation_seconds histogram"]
+        with self._lock:
+            histograms = [(name, histogram.buckets, list(histogram.counts), histogram.count,
+                           histogram.total, histogram.errors)
+                          for name, histogram in sorted(self.histograms.items())]
+        for name, buckets, counts, count, total, _ in histograms:
+            cumulative = 0
+            for upper, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'vu1_operation_seconds_bucket{{operation="{name}",le="{upper}"}} '
+                             f'{cumulative}')
+            lines.append(f'vu1_operation_seconds_bucket{{operation="{name}",le="+Inf"}} {count}')
+            lines.append(f'vu1_operation_seconds_sum{{operation="{name}"}} {total}')
+            lines.append(f'vu1_operation_seconds_count{{operation="{name}"}} {count}')
+        lines += ["# HELP vu1_operation_errors_total Failed sensor reads and API calls",
+                  "# TYPE vu1_operation_errors_total counter"]
+        for name, _, _, _, _, errors in histograms:
+            lines.append(f'vu1_operation_errors_total{{operation="{name}"}} {errors}')
+        for name, value in self.snapshot()["counters"].items():
+            _, help_text, kind = self.counters[name]
+            lines += [f"# HELP vu1_{name} {help_text}", f"# TYPE vu1_{name} {kind}",
+                      f"vu1_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body, content_type = metrics.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer:
+    """Serves /metrics (Prometheus text) and /metrics.json on a background thread"""
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = metrics
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="vu1-metrics", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,98 @@
+"""Debounced, atomic JSON persistence for settings and assignments"""
+import copy
+import json
+import os
+import threading
+import time
+
+
+def write_json_atomic(path, data, indent=4):
+    """Writes JSON through a temporary file and a rename, so a crash never leaves half a file"""
+    text = json.dumps(data, indent=indent)
+    _write_text_atomic(path, text)
+    return text
+
+
+def _write_text_atomic(path, text):
+    temp_file = path + ".tmp"
+    with open(temp_file, "w") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, path)
+
+
+class JsonStore:
+    """Writes a JSON file on a background thread once edits have settled
+
+    save() only takes a copy of the data, serializing and writing happen
+    delay seconds after the last call on the writer thread. Unchanged
+    content is not written again. flush() writes a pending save right away,
+    e.g. before the application exits.
+    """
+
+    def __init__(self, path, delay=0.5, indent=4):
+        self.path = path
+        self.delay = delay
+        self.indent = indent
+        self.writes = 0
+        self.skipped = 0  # saves that did not change the file
+        self._pending = None
+        self._due = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        try:
+            with open(path, "r") as file:
+                self._last_text = file.read()
+        except OSError:
+            self._last_text = None
+        self._thread = threading.Thread(target=self._run, name="vu1-store", daemon=True)
+        self._thread.start()
+
+    def save(self, data):
+        """Schedules data to be written, replacing a save that is still pending"""
+        data = copy.deepcopy(data)  # later edits on the GUI thread must not leak into the write
+        with self._condition:
+            self._pending = data
+            self._due = time.monotonic() + self.delay
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (
+                        self._pending is None or time.monotonic() < self._due):
+                    timeout = None if self._pending is None else self._due - time.monotonic()
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Writes a pending save now, returns False if writing failed"""
+        with self._write_lock:
+            with self._condition:
+                data, self._pending = self._pending, None
+            if data is None:
+                return True
+            try:
+                text = json.dumps(data, indent=self.indent)
+                if text == self._last_text:
+                    self.skipped += 1
+                    return True
+                _write_text_atomic(self.path, text)
+                self._last_text = text
+                self.writes += 1
+                return True
+            except Exception as e:
+                print(f"Error saving {self.path}: {e}")
+                return False
+
+    def close(self):
+        """Writes what is pending and stops the writer thread"""
+        result = self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        return result
@@ -0,0 +1,240 @@
+"""Append-only recording of sensor samples in memory-mapped columnar segments
+
+A segment file holds a fixed number of rows. After the header come a
+timestamp column and one float64 column per sensor ID, each column
+preallocated for all rows, so appending a sample writes a few values in
+place and never moves data. A new segment is started when one is full, when
+a new sensor appears, or when recorded sensors have been missing for a
+while. A sensor that skips a few reads is recorded as NaN instead. Closed
+segments are cut down to the rows they hold, and the oldest segments are
+deleted once the recording grows beyond its size cap.
+
+Writing only needs the standard library, read_range() needs NumPy.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b"VU1REC1\0"
+# magic, version, column count (with timestamps), row capacity, rows written
+HEADER = struct.Struct("<8sIIQQ")
+CAPACITY_OFFSET = 16  # offset of "row capacity" in the header
+ROWS_OFFSET = 24  # offset of "rows written" in the header
+SUFFIX = ".vu1rec"
+VALUE = struct.Struct("<d")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _data_offset(names_length):
+    # Columns start 8 byte aligned after the header and the JSON list of sensor IDs
+    return (HEADER.size + 4 + names_length + 7) // 8 * 8
+
+
+class Segment:
+    """One memory-mapped segment file opened for appending"""
+
+    def __init__(self, path, sensor_ids, capacity):
+        self.path = path
+        self.sensor_ids = list(sensor_ids)
+        self.sensor_set = set(self.sensor_ids)
+        self.capacity = capacity
+        self.rows = 0
+        names = json.dumps(self.sensor_ids).encode()
+        self.data_offset = _data_offset(len(names))
+        columns = len(self.sensor_ids) + 1
+        size = self.data_offset + columns * capacity * 8
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, 1, columns, capacity, 0))
+            file.write(struct.pack("<I", len(names)) + names)
+            file.truncate(size)  # sparse on most file systems until written
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.column_offsets = [self.data_offset + column * capacity * 8
+                               for column in range(columns)]
+
+    @property
+    def full(self):
+        return self.rows >= self.capacity
+
+    def append(self, timestamp, values):
+        row = self.rows * 8
+        VALUE.pack_into(self.map, self.column_offsets[0] + row, timestamp)
+        for offset, value in zip(self.column_offsets[1:], values):
+            VALUE.pack_into(self.map, offset + row, value)
+        # Readers only trust rows counted here, so the count is written last
+        self.rows += 1
+        struct.pack_into("<Q", self.map, ROWS_OFFSET, self.rows)
+
+    def close(self):
+        """Moves the columns together so the file only keeps the rows written"""
+        if self.rows < self.capacity:
+            size = self.data_offset + len(self.column_offsets) * self.rows * 8
+            # Columns move towards the start, in order, so none is overwritten early
+            for column, offset in enumerate(self.column_offsets):
+                self.map.move(self.data_offset + column * self.rows * 8, offset, self.rows * 8)
+            struct.pack_into("<Q", self.map, CAPACITY_OFFSET, self.rows)
+            self.capacity = self.rows
+        else:
+            size = len(self.map)
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(size)
+        self.file.close()
+
+
+class SensorRecorder:
+    """Records every sensor sample of the update loop into a folder of segments
+
+    A recorded sensor that is missing from a sample is written as NaN. Only
+    once it has been missing for drop_after samples in a row is a segment
+    without it started.
+    """
+
+    def __init__(self, directory, segment_rows=3600, max_bytes=100 * 1024 * 1024,
+                 drop_after=300):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.max_bytes = max_bytes
+        self.drop_after = drop_after
+        self.segment = None
+        self._missing = {}  # sensor_id -> samples in a row without it
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, timestamp, sensor_index):
+        """Appends one row with the value of every sensor in the index"""
+        with self._lock:
+            segment = self.segment
+            if segment is None or segment.full:
+                self._rotate(timestamp, sorted(sensor_index))
+            elif any(sensor_id not in segment.sensor_set for sensor_id in sensor_index):
+                # A new sensor, keep the ones that only skipped a read
+                self._rotate(timestamp, sorted(segment.sensor_set.union(sensor_index)))
+            elif self._missing or len(sensor_index) < len(segment.sensor_ids):
+                self._count_missing(timestamp, sensor_index)
+            self.segment.append(timestamp, [_to_float(sensor_index.get(sensor_id))
+                                            for sensor_id in self.segment.sensor_ids])
+
+    def _count_missing(self, timestamp, sensor_index):
+        for sensor_id in self.segment.sensor_ids:
+            if sensor_id in sensor_index:
+                self._missing.pop(sensor_id, None)
+            else:
+                self._missing[sensor_id] = self._missing.get(sensor_id, 0) + 1
+        if self._missing and max(self._missing.values()) >= self.drop_after:
+            self._rotate(timestamp, [sensor_id for sensor_id in self.segment.sensor_ids
+                                if self._missing.get(sensor_id, 0) < self.drop_after])
+
+    def _rotate(self, timestamp, sensor_ids):
+        if self.segment:
+            self.segment.close()
+        # Names are start times in ms, two rotations in the same ms get the next free one
+        start = int(timestamp * 1000)
+        path = os.path.join(self.directory, f"{start:015d}{SUFFIX}")
+        while os.path.exists(path):
+            start += 1
+            path = os.path.join(self.directory, f"{start:015d}{SUFFIX}")
+        self.segment = Segment(path, sensor_ids, self.segment_rows)
+        self._missing = {}
+        self._enforce_cap()
+
+    def _enforce_cap(self):
+        segments = list_segments(self.directory)
+        total = sum(os.path.getsize(path) for path in segments)
+        # Never delete the segment that is being written
+        for path in segments[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= os.path.getsize(path)
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error removing old recording {path}: {e}")
+
+    def close(self):
+        with self._lock:
+            if self.segment:
+                self.segment.close()
+                self.segment = None
+
+
+def list_segments(directory):
+    """Returns the segment files of a recording folder, oldest first"""
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(SUFFIX))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in names]
+
+
+def _segment_start(path):
+    return int(os.path.basename(path)[:-len(SUFFIX)]) / 1000
+
+
+def read_segment(path):
+    """Returns (timestamps, {sensor_id: values}) of one segment as NumPy arrays"""
+    import numpy as np
+
+    with open(path, "rb") as file:
+        magic, _, columns, capacity, rows = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a sensor recording")
+        names_length, = struct.unpack("<I", file.read(4))
+        sensor_ids = json.loads(file.read(names_length))
+    data = np.memmap(path, dtype="<f8", mode="r", offset=_data_offset(names_length),
+                     shape=(columns, capacity))
+    return data[0, :rows], {sensor_id: data[column + 1, :rows]
+                            for column, sensor_id in enumerate(sensor_ids)}
+
+
+def read_range(directory, start=None, end=None, sensor_ids=None):
+    """Returns (timestamps, {sensor_id: values}) for start <= time < end
+
+    start and end are Unix timestamps, None means unbounded. Sensors that
+    were not recorded in part of the range are NaN there. Only the segments
+    that overlap the range are opened, and only the selected rows are copied.
+    """
+    import numpy as np
+
+    segments = list_segments(directory)
+    starts = [_segment_start(path) for path in segments]
+    parts = []
+    for index, path in enumerate(segments):
+        following = starts[index + 1] if index + 1 < len(segments) else math.inf
+        if (end is not None and starts[index] >= end) or (start is not None and following < start):
+            continue
+        timestamps, columns = read_segment(path)
+        first = 0 if start is None else np.searchsorted(timestamps, start, "left")
+        last = len(timestamps) if end is None else np.searchsorted(timestamps, end, "left")
+        if last > first:
+            parts.append((timestamps[first:last], {sensor_id: values[first:last]
+                                                   for sensor_id, values in columns.items()}))
+    if sensor_ids is None:
+        sensor_ids = sorted({sensor_id for _, columns in parts for sensor_id in columns})
+    if not parts:
+        return np.zeros(0), {sensor_id: np.zeros(0) for sensor_id in sensor_ids}
+    timestamps = np.concatenate([part[0] for part in parts])
+    values = {}
+    for sensor_id in sensor_ids:
+        values[sensor_id] = np.concatenate([
+            columns[sensor_id] if sensor_id in columns else np.full(len(part_times), np.nan)
+            for part_times, columns in parts])
+    return timestamps, values
+
+
+def recorder_from_settings(settings, base_path):
+    """Creates the recorder configured in settings.json, or None if recording is off"""
+    if not settings.get("record_sensors"):
+        return None
+    directory = settings.get("recording_dir") or os.path.join(base_path, "recordings")
+    return SensorRecorder(directory, settings.get("recording_segment_rows", 3600),
+                          int(settings.get("recording_max_mb", 100) * 1024 * 1024))
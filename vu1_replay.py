@@ -0,0 +1,219 @@
+"""Replay and synthetic load for the dial update path, for capacity testing
+
+Feeds recorded (vu1_recorder) or generated sensor values through the same
+DialUpdater.schedule_sensor_updates() path the GUI and the daemon use and
+reports the sustained dial writes per second. With --sweep the update rate
+is doubled until the pipeline saturates.
+
+    python vu1_replay.py --mock --dials 32 --rate 10 --duration 10
+    python vu1_replay.py --mock --dials 32 --sweep
+    python vu1_replay.py --server http://localhost:5340 --key KEY --recording recordings --speed 60
+
+--mock starts benchmarks/mock_server.py in-process instead of using a real
+VU1 server. Be careful with real dials: every dial is written at the full rate.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+from vu1_client import VU1Client
+from vu1_engine import ChangeFilter, DialUpdater
+from vu1_metrics import Metrics
+from vu1_sensors import SensorSource
+
+
+class SyntheticSource(SensorSource):
+    """Sensors whose values move along phase-shifted sine waves on every read"""
+    name = "synthetic"
+
+    def __init__(self, sensor_count, period=20):
+        self.sensor_ids = [f"SYN{i}" for i in range(sensor_count)]
+        self.period = period  # reads per full wave
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        phase = 2 * math.pi * self.reads / self.period
+        count = len(self.sensor_ids)
+        return {"sys": [{"id": sensor_id, "label": sensor_id,
+                         "value": f"{50 + 45 * math.sin(phase + 2 * math.pi * i / count):.2f}"}
+                        for i, sensor_id in enumerate(self.sensor_ids)]}
+
+
+class ReplaySource(SensorSource):
+    """Plays back a recording one row per read, starting over at the end"""
+    name = "replay"
+
+    def __init__(self, timestamps, values):
+        if not len(timestamps):
+            raise ValueError("The recording is empty")
+        self.timestamps = timestamps
+        self.sensor_ids = sorted(values)
+        self.columns = [values[sensor_id].tolist() for sensor_id in self.sensor_ids]
+        self.row = -1
+
+    def advance(self):
+        """Moves to the next row and returns the recorded seconds since the previous one"""
+        previous = self.row
+        self.row = (self.row + 1) % len(self.timestamps)
+        if previous < 0 or self.row == 0:
+            return 0.0
+        return float(self.timestamps[self.row] - self.timestamps[previous])
+
+    def read(self):
+        return {"sys": [{"id": sensor_id, "label": sensor_id, "value": column[self.row]}
+                        for sensor_id, column in zip(self.sensor_ids, self.columns)
+                        if column[self.row] == column[self.row]]}  # skip NaN
+
+
+class LoadDriver:
+    """Runs update passes for all dials at a fixed rate or at replay speed"""
+
+    def __init__(self, client, source, dial_ids, max_concurrency=8):
+        self.source = source
+        self.dial_ids = list(dial_ids)
+        self.metrics = Metrics()
+        self.updater = DialUpdater(client, source, ChangeFilter(),
+                                   max_concurrency=max_concurrency, metrics=self.metrics)
+        # Dials take the sensors in turn, so more dials than sensors is fine
+        sensor_ids = source.sensor_ids
+        self.updater.set_assignments({dial_id: sensor_ids[i % len(sensor_ids)]
+                                      for i, dial_id in enumerate(self.dial_ids)}, {}, {})
+
+    def run(self, duration, rate=1.0, speed=1.0):
+        """Runs passes for duration seconds and returns the achieved throughput
+
+        rate is the number of passes per second, a replay instead follows the
+        recorded timestamps divided by speed. speed 0 runs as fast as possible.
+        """
+        stats_before = self.updater.change_filter.stats()
+        overruns_before = self.updater.overruns
+        stale_before = self.updater.commands.dropped_stale
+        self.metrics.histograms.pop("tick", None)
+        started = time.monotonic()
+        deadline = started
+        passes = 0
+        while time.monotonic() - started < duration:
+            if isinstance(self.source, ReplaySource):
+                recorded = self.source.advance()
+                interval = recorded / speed if speed else 0.0
+            else:
+                interval = 1 / (rate * speed) if speed else 0.0
+            # Fixed grid like the scheduler, a slow pass does not shift the next ones
+            deadline += interval
+            self.updater.schedule_sensor_updates(self.dial_ids, interval or None)
+            passes += 1
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        elapsed = time.monotonic() - started
+        stats = self.updater.change_filter.stats()
+        tick = self.metrics.snapshot()["timings"].get("tick", {})
+        return {
+            "passes": passes,
+            "passes_per_s": passes / elapsed,
+            "writes_per_s": (stats["sent"] - stats_before["sent"]) / elapsed,
+            "suppressed": stats["suppressed"] - stats_before["suppressed"],
+            "overruns": self.updater.overruns - overruns_before,
+            "superseded": self.updater.commands.dropped_stale - stale_before,
+            "tick_p50_ms": tick.get("p50_ms", 0.0),
+            "tick_p95_ms": tick.get("p95_ms", 0.0),
+        }
+
+    def sweep(self, duration, start_rate=1.0, max_rate=1024.0):
+        """Doubles the rate until fewer than 90% of the intended writes get through
+
+        Returns the results of all steps and the last rate that kept up.
+        """
+        results = []
+        rate = start_rate
+        sustained = None
+        while rate <= max_rate:
+            result = self.run(duration, rate)
+            result["rate"] = rate
+            result["target_writes_per_s"] = rate * len(self.dial_ids)
+            results.append(result)
+            if result["writes_per_s"] < 0.9 * result["target_writes_per_s"]:
+                break
+            sustained = rate
+            rate *= 2
+        return results, sustained
+
+    def close(self):
+        # Let running writes finish before the caller closes the client or server
+        self.updater.close(wait=True)
+
+
+def print_result(result):
+    rate = f"{result['rate']:.0f}" if result.get("rate") else "-"
+    print(f"{rate:>7} {result['passes_per_s']:>9.1f} "
+          f"{result['writes_per_s']:>9.0f} {result['tick_p50_ms']:>8.1f} "
+          f"{result['tick_p95_ms']:>8.1f} {result['overruns']:>8} {result['superseded']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or synthetic load for the dial pipeline")
+    parser.add_argument("--server", default="http://localhost:5340")
+    parser.add_argument("--key", default="")
+    parser.add_argument("--mock", action="store_true",
+                        help="use an in-process mock server with --dials dials")
+    parser.add_argument("--latency", type=float, default=2.0,
+                        help="mock server delay per request in milliseconds")
+    parser.add_argument("--dials", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1.0, help="update passes per second")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="time factor, e.g. 10 for 10x, 0 for as fast as possible")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--recording", help="folder written by the sensor recorder to replay")
+    parser.add_argument("--sweep", action="store_true",
+                        help="double the rate until the writes no longer keep up")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server = None
+    if args.mock:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+        from mock_server import MockVU1Server
+        server = MockVU1Server(args.dials, latency=args.latency / 1000).start()
+        address, key, dial_ids = server.url, server.api_key, list(server.dials)
+    else:
+        address, key = args.server, args.key
+    client = VU1Client(address, key, pool_size=max(10, args.max_concurrency))
+    if not args.mock:
+        dial_ids = [dial["uid"] for dial in client.list_dials()][:args.dials]
+
+    if args.recording:
+        from vu1_recorder import read_range
+        source = ReplaySource(*read_range(args.recording))
+    else:
+        source = SyntheticSource(len(dial_ids))
+    driver = LoadDriver(client, source, dial_ids, args.max_concurrency)
+    print(f"{len(dial_ids)} dials, {source.name} source, {args.max_concurrency} parallel writes")
+    print(f"{'rate':>7} {'passes/s':>9} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'overruns':>8} {'superseded':>10}")
+    try:
+        if args.sweep:
+            results, sustained = driver.sweep(args.duration)
+            for result in results:
+                print_result(result)
+            if sustained is None:
+                print("Saturated already at the first rate")
+            else:
+                print(f"Sustained up to {sustained:g} passes/s "
+                      f"({sustained * len(dial_ids):g} writes/s), saturated at "
+                      f"{results[-1]['rate']:g} passes/s")
+        else:
+            result = driver.run(args.duration, args.rate, args.speed)
+            result["rate"] = None if args.recording else args.rate
+            print_result(result)
+    finally:
+        driver.close()
+        client.close()
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
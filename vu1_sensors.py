@@ -0,0 +1,410 @@
+"""Sensor backends and lookup helpers shared by the GUI and the update loop"""
+import html
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+
+
+def parse_sensor_id(sensor_text):
+    """Extracts the sensor ID from a "label (id)" combo box entry"""
+    if not sensor_text:
+        return None
+    return sensor_text.split('(')[-1].strip(')')
+
+
+def build_sensor_index(data):
+    """Turns one AIDA64 snapshot into an id -> value index"""
+    index = {}
+    if not data:
+        return index
+    for category in data.values():
+        if isinstance(category, list):
+            for item in category:
+                # The first category that exports an ID wins, like the old linear search
+                index.setdefault(item.get('id'), item.get('value'))
+    return index
+
+
+def build_sensor_catalog(data):
+    """Returns id -> "label (id)" for every labelled sensor in a snapshot"""
+    catalog = {}
+    if not data:
+        return catalog
+    for category in data.values():
+        if isinstance(category, list):
+            for item in category:
+                if 'label' in item and 'id' in item:
+                    catalog.setdefault(item['id'], f"{item['label']} ({item['id']})")
+    return catalog
+
+
+def read_snapshot(source, catalog=False, metrics=None):
+    """Reads one snapshot (or the full catalog) from a sensor source, an empty one on errors"""
+    started = time.perf_counter()
+    error = False
+    try:
+        return source.read_catalog() if catalog else source.read()
+    except Exception as e:
+        error = True
+        print(f"Error retrieving sensor data: {e}")
+        return {}
+    finally:
+        if metrics:
+            metrics.observe("sensor_catalog" if catalog else "sensor_read",
+                            time.perf_counter() - started, error)
+
+
+class SensorSource:
+    """Base class for sensor backends
+
+    read() returns a snapshot in the AIDA64 layout: a dict of category name
+    to a list of {"id", "label", "value"} dicts. A selective source only
+    returns the sensors passed to set_wanted_ids() and needs read_catalog()
+    for the full list.
+    """
+    name = None
+    selective = False
+
+    def read(self):
+        raise NotImplementedError
+
+    def read_catalog(self):
+        """Returns a snapshot with every sensor the source knows"""
+        return self.read()
+
+    def set_wanted_ids(self, sensor_ids):
+        """Tells a selective source which sensor IDs read() has to return"""
+
+    def close(self):
+        """Releases any handles the source keeps open"""
+
+
+class AIDA64Source(SensorSource):
+    """Reads all sensors through python_aida64.getData() (Windows only)"""
+    name = "python_aida64"
+
+    def __init__(self):
+        # Imported here so the other backends work without python_aida64
+        from python_aida64 import getData
+        self._get_data = getData
+
+    def read(self):
+        return self._get_data()
+
+
+class HwmonSource(SensorSource):
+    """Reads Linux hwmon sensors and CPU/memory load from /sys and /proc
+
+    Every file is opened once and re-read with pread() on each tick, which
+    makes the kernel regenerate its content without a new open/close.
+    """
+    name = "hwmon"
+
+    # file prefix -> (AIDA64-style category, divisor to base units)
+    KINDS = {
+        "temp": ("temp", 1000),   # millidegree Celsius
+        "fan": ("fan", 1),        # RPM
+        "in": ("volt", 1000),     # millivolt
+        "curr": ("curr", 1000),   # milliampere
+        "power": ("pwr", 1000000),  # microwatt
+    }
+
+    def __init__(self, hwmon_root="/sys/class/hwmon", proc_root="/proc"):
+        self.hwmon_root = hwmon_root
+        self.proc_root = proc_root
+        self._sensors = []  # (fd, category, id, label, divisor)
+        self._stat_fd = self._open(os.path.join(proc_root, "stat"))
+        self._meminfo_fd = self._open(os.path.join(proc_root, "meminfo"))
+        self._last_cpu = None
+        self._scan()
+
+    def _open(self, path):
+        try:
+            return os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+
+    def _read_text(self, fd):
+        return os.pread(fd, 4096, 0).decode("ascii", "replace")
+
+    def _scan(self):
+        """Finds all sensor files once and keeps them open"""
+        try:
+            chips = sorted(os.listdir(self.hwmon_root))
+        except OSError:
+            return
+        seen_names = {}
+        for chip in chips:
+            chip_path = os.path.join(self.hwmon_root, chip)
+            name = self._read_attribute(os.path.join(chip_path, "name")) or chip
+            # Two chips with the same driver name get a numbered ID
+            seen_names[name] = seen_names.get(name, 0) + 1
+            chip_id = name if seen_names[name] == 1 else f"{name}#{seen_names[name]}"
+            try:
+                files = sorted(os.listdir(chip_path))
+            except OSError:
+                continue
+            for file_name in files:
+                if not (file_name.endswith("_input") or
+                        (file_name.startswith("power") and file_name.endswith("_average"))):
+                    continue
+                prefix = file_name.rsplit("_", 1)[0]
+                kind = prefix.rstrip("0123456789")
+                if kind not in self.KINDS:
+                    continue
+                fd = self._open(os.path.join(chip_path, file_name))
+                if fd is None:
+                    continue
+                category, divisor = self.KINDS[kind]
+                label = (self._read_attribute(os.path.join(chip_path, f"{prefix}_label"))
+                         or prefix)
+                self._sensors.append((fd, category, f"HW.{chip_id}.{prefix}",
+                                      f"{name} {label}", divisor))
+
+    def _read_attribute(self, path):
+        try:
+            with open(path, "r") as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    def _read_value(self, fd):
+        return int(self._read_text(fd))
+
+    def read(self):
+        data = {kind: [] for kind, _ in self.KINDS.values()}
+        data["sys"] = []
+        for fd, category, sensor_id, label, divisor in self._sensors:
+            try:
+                value = self._read_value(fd) / divisor
+            except (OSError, ValueError):
+                continue  # e.g. a sensor of a device that went to sleep
+            data[category].append({"id": sensor_id, "label": label, "value": value})
+
+        # Same IDs as AIDA64, so assignments carry over between backends
+        cpu_usage = self._read_cpu_usage()
+        if cpu_usage is not None:
+            data["sys"].append({"id": "SCPUUTI", "label": "CPU Utilization", "value": cpu_usage})
+        memory_usage = self._read_memory_usage()
+        if memory_usage is not None:
+            data["sys"].append({"id": "SMEMUTI", "label": "Memory Utilization",
+                                "value": memory_usage})
+        return data
+
+    def _read_cpu_usage(self):
+        """CPU load in percent since the previous read"""
+        if self._stat_fd is None:
+            return None
+        cpu_line = self._read_text(self._stat_fd).split("\n", 1)[0]
+        fields = [int(field) for field in cpu_line.split()[1:]]
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        total = sum(fields)
+        last = self._last_cpu
+        self._last_cpu = (idle, total)
+        if last is None or total == last[1]:
+            return 0.0
+        return round(100 * (1 - (idle - last[0]) / (total - last[1])), 1)
+
+    def _read_memory_usage(self):
+        """Used memory in percent"""
+        if self._meminfo_fd is None:
+            return None
+        values = {}
+        for line in self._read_text(self._meminfo_fd).splitlines():
+            key, _, rest = line.partition(":")
+            values[key] = int(rest.split()[0]) if rest.split() else 0
+            if "MemTotal" in values and "MemAvailable" in values:
+                break
+        if not values.get("MemTotal"):
+            return None
+        return round(100 * (1 - values.get("MemAvailable", 0) / values["MemTotal"]), 1)
+
+    def close(self):
+        for fd in [sensor[0] for sensor in self._sensors] + [self._stat_fd, self._meminfo_fd]:
+            if fd is not None:
+                os.close(fd)
+        self._sensors = []
+        self._stat_fd = self._meminfo_fd = None
+
+
+class AIDA64SharedMemorySource(SensorSource):
+    """Reads the AIDA64 shared memory block and only parses what is needed
+
+    The block holds XML fragments like
+    <temp><id>TCPU</id><label>CPU</label><value>45</value></temp>.
+    read() skips parsing while the block is unchanged and otherwise looks up
+    just the wanted IDs. On other systems a NUL padded file with the same
+    content can stand in for the shared memory (path).
+    """
+    name = "aida64"
+    selective = True
+    TAG_NAME = "AIDA64_SensorValues"
+    ENTRY = re.compile(rb"<(\w+)><id>([^<]*)</id><label>([^<]*)</label><value>([^<]*)</value></\1>")
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._file = None
+        self._warned_unterminated = False
+        if path:
+            self._file = open(path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = self._open_shared_memory()
+        self._wanted = []
+        self._last_raw = None
+        self._last_snapshot = {}
+
+    def _open_shared_memory(self):
+        # The size of the block depends on the number of exported sensors, a
+        # view of a smaller size would silently cut off the last ones
+        size = self._shared_memory_size()
+        # Mapping by tag name creates an empty block if AIDA64 has none, so
+        # the fixed sizes are only tried when the block exists but was not sized
+        sizes = [size] if size else [65536 * 16, 65536 * 4, 65536, 32768, 16384, 8192, 4096]
+        for size in sizes:
+            try:
+                return mmap.mmap(-1, size, tagname=self.TAG_NAME, access=mmap.ACCESS_READ)
+            except (OSError, TypeError):
+                continue
+        raise OSError("AIDA64 shared memory is not available, is Shared Memory enabled in AIDA64?")
+
+    def _shared_memory_size(self):
+        """Returns the size of the AIDA64 block in bytes, or None if it cannot be found
+
+        Raises OSError on Windows if AIDA64 does not share its sensor values.
+        """
+        if sys.platform != "win32":
+            return None
+        import ctypes
+        from ctypes import wintypes
+
+        class MemoryBasicInformation(ctypes.Structure):
+            _fields_ = [("BaseAddress", ctypes.c_void_p), ("AllocationBase", ctypes.c_void_p),
+                        ("AllocationProtect", wintypes.DWORD), ("RegionSize", ctypes.c_size_t),
+                        ("State", wintypes.DWORD), ("Protect", wintypes.DWORD),
+                        ("Type", wintypes.DWORD)]
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.OpenFileMappingW.restype = wintypes.HANDLE
+        kernel32.OpenFileMappingW.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.LPCWSTR]
+        kernel32.MapViewOfFile.restype = ctypes.c_void_p
+        kernel32.MapViewOfFile.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.DWORD,
+                                           wintypes.DWORD, ctypes.c_size_t]
+        kernel32.VirtualQuery.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+        kernel32.UnmapViewOfFile.argtypes = [ctypes.c_void_p]
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        FILE_MAP_READ = 0x0004
+
+        handle = kernel32.OpenFileMappingW(FILE_MAP_READ, False, self.TAG_NAME)
+        if not handle:
+            raise OSError("AIDA64 shared memory is not available, "
+                          "is Shared Memory enabled in AIDA64?")
+        try:
+            # A view of size 0 covers the whole block, its region size is the block size
+            view = kernel32.MapViewOfFile(handle, FILE_MAP_READ, 0, 0, 0)
+            if not view:
+                return None
+            try:
+                info = MemoryBasicInformation()
+                if not kernel32.VirtualQuery(view, ctypes.byref(info), ctypes.sizeof(info)):
+                    return None
+                return info.RegionSize
+            finally:
+                kernel32.UnmapViewOfFile(view)
+        finally:
+            kernel32.CloseHandle(handle)
+
+    def _read_raw(self):
+        end = self._map.find(b"\x00")
+        if end < 0 and not self._warned_unterminated:
+            self._warned_unterminated = True
+            print(f"Warning: the AIDA64 sensor data does not end within the {len(self._map)} "
+                  f"mapped bytes, the last sensors may be missing")
+        return self._map[:end if end >= 0 else len(self._map)]
+
+    def set_wanted_ids(self, sensor_ids):
+        with self._lock:
+            self._wanted = sorted(sensor_ids)
+            self._last_raw = None  # parse again on the next read
+
+    def read(self):
+        with self._lock:
+            raw = self._read_raw()
+            if raw == self._last_raw:
+                return self._last_snapshot
+            snapshot = {}
+            for sensor_id in self._wanted:
+                entry = self._find_entry(raw, sensor_id)
+                if entry:
+                    category, item = entry
+                    snapshot.setdefault(category, []).append(item)
+            self._last_raw = raw
+            self._last_snapshot = snapshot
+            return snapshot
+
+    def _find_entry(self, raw, sensor_id):
+        """Locates one sensor by searching for its <id> element"""
+        # IDs are shared unescaped, like read_catalog() reports them
+        escaped = html.escape(sensor_id, quote=False).encode()
+        position = raw.find(b"<id>" + escaped + b"</id>")
+        if position < 0:
+            position = raw.find(b"<id>" + sensor_id.encode() + b"</id>")
+        if position < 0:
+            return None
+        start = raw.rfind(b"<", 0, position)
+        match = self.ENTRY.match(raw, start)
+        if not match:
+            return None
+        return self._to_item(match)
+
+    def _to_item(self, match):
+        category, sensor_id, label, value = (group.decode("utf-8", "replace")
+                                             for group in match.groups())
+        return category, {"id": html.unescape(sensor_id), "label": html.unescape(label),
+                          "value": value}
+
+    def read_catalog(self):
+        with self._lock:
+            raw = self._read_raw()
+        catalog = {}
+        for match in self.ENTRY.finditer(raw):
+            category, item = self._to_item(match)
+            catalog.setdefault(category, []).append(item)
+        return catalog
+
+    def close(self):
+        self._map.close()
+        if self._file:
+            self._file.close()
+
+
+SENSOR_SOURCES = {
+    AIDA64SharedMemorySource.name: AIDA64SharedMemorySource,
+    AIDA64Source.name: AIDA64Source,
+    HwmonSource.name: HwmonSource,
+}
+
+
+def default_sensor_source():
+    """AIDA64 on Windows, hwmon everywhere else"""
+    return "aida64" if sys.platform == "win32" else "hwmon"
+
+
+def create_sensor_source(name=None, **options):
+    """Creates the sensor backend registered under name"""
+    name = name or default_sensor_source()
+    if name not in SENSOR_SOURCES:
+        raise ValueError(f"Unknown sensor source: {name}")
+    return SENSOR_SOURCES[name](**options)
+
+
+def sensor_source_from_settings(settings):
+    """Creates the sensor backend configured in settings.json"""
+    name = settings.get("sensor_source") or default_sensor_source()
+    options = {}
+    if name == "aida64" and settings.get("aida64_file"):
+        options["path"] = settings["aida64_file"]
+    return create_sensor_source(name, **options)